@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Category, Product, SalesDaily
+
+# Sales analytics for the admin dashboard.
+#
+# sales_daily holds one row per (day, product) with the units sold and the
+# revenue. checkout() adds each order to it in the same transaction that writes
+# the order, so the dashboard reads a few summary rows per day instead of
+# scanning the whole order history. `flask rebuild-sales-summary` recomputes the
+# table from order_lines, e.g. after editing orders by hand.
+
+REBUILD_SQL = """
+    INSERT INTO sales_daily (day, product_id, category_id, units, revenue)
+    SELECT date(orders.created_at), order_lines.product_id, products.category_id,
+           sum(order_lines.quantity), sum(order_lines.quantity * order_lines.unit_price)
+    FROM order_lines
+    JOIN orders ON orders.order_id = order_lines.order_id
+    LEFT JOIN products ON products.product_id = order_lines.product_id
+    GROUP BY date(orders.created_at), order_lines.product_id
+"""
+
+
+def record_sales(db_session, day, lines):
+    # lines: (product_id, category_id, quantity, unit_price) for one order, added with one upsert
+    if not lines:
+        return
+    stmt = insert(SalesDaily).values([
+        {'day': day, 'product_id': product_id, 'category_id': category_id,
+         'units': quantity, 'revenue': quantity * unit_price}
+        for product_id, category_id, quantity, unit_price in lines
+    ])
+    db_session.execute(stmt.on_conflict_do_update(
+        index_elements=['day', 'product_id'],
+        set_={
+            'units': SalesDaily.units + stmt.excluded.units,
+            'revenue': SalesDaily.revenue + stmt.excluded.revenue,
+        }
+    ))
+
+
+def rebuild_sales_summary(db_session):
+    # Returns the number of summary rows written. The caller commits.
+    db_session.execute(delete(SalesDaily))
+    return db_session.execute(text(REBUILD_SQL)).rowcount
+
+
+def _since(days):
+    # sales_daily.day is the UTC date of the order (Order.created_at is UTC), so
+    # the window ends on today's UTC date whatever the server's time zone
+    return datetime.utcnow().date() - timedelta(days=days - 1) if days else None
+
+
+def _in_range(stmt, days):
+    since = _since(days)
+    return stmt.where(SalesDaily.day >= since) if since else stmt
+
+
+def sales_by_day(db_session, days):
+    stmt = select(SalesDaily.day, func.sum(SalesDaily.units), func.sum(SalesDaily.revenue))
+    stmt = _in_range(stmt, days).group_by(SalesDaily.day).order_by(SalesDaily.day.desc())
+    return db_session.execute(stmt).all()
+
+
+def sales_by_category(db_session, days):
+    stmt = (
+        select(Category.category_name, func.sum(SalesDaily.units), func.sum(SalesDaily.revenue))
+        .select_from(SalesDaily)
+        .outerjoin(Category, Category.category_id == SalesDaily.category_id)
+    )
+    stmt = _in_range(stmt, days).group_by(SalesDaily.category_id).order_by(func.sum(SalesDaily.revenue).desc())
+    return db_session.execute(stmt).all()
+
+
+def top_products(db_session, days, limit=20):
+    stmt = (
+        select(SalesDaily.product_id, Product.product_name, func.sum(SalesDaily.units).label('units'),
+               func.sum(SalesDaily.revenue).label('revenue'))
+        .select_from(SalesDaily)
+        .outerjoin(Product, Product.product_id == SalesDaily.product_id)
+    )
+    stmt = (_in_range(stmt, days).group_by(SalesDaily.product_id)
+            .order_by(func.sum(SalesDaily.revenue).desc()).limit(limit))
+    return db_session.execute(stmt).all()
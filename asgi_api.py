@@ -0,0 +1,209 @@
+import logging
+import os
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.http import http_date, parse_date, parse_etags
+
+from catalog_cache import FileCatalogVersion
+from conditional import catalog_etag
+from db import set_sqlite_pragmas
+from models import Category, Product
+from pagination import keyset_statement, page_args, split_page
+from serializers import (async_json_array_chunks, async_ndjson_chunks, dumps,
+                         product_to_dict)
+
+# Async (ASGI) version of the read-only JSON API: /api/products and /api/categories.
+#
+# Same URLs, parameters and JSON as the Flask views in main.py (including the
+# streamed ?stream=1 and ?format=ndjson exports of /api/products), built from
+# the same models, serializers and keyset pagination, but served on SQLAlchemy's
+# asyncio engine (aiosqlite). A request waiting on the database doesn't hold a
+# thread, so one process can keep thousands of API connections open:
+#     uvicorn asgi_api:app --port 8001
+#
+# Set CATALOG_VERSION_FILE to the same file as the Flask app to get the same
+# ETags and 304 responses; without it every request is answered with a 200.
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///database/mygrocerystore.db')
+CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE')
+PRODUCTS_PER_PAGE = 24
+MAX_PRODUCTS_PER_PAGE = 100
+EXPORT_BATCH_SIZE = 500  # Rows read per round-trip by the streamed exports
+DB_POOL_SIZE = int(os.environ.get('API_DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = 20
+DB_BUSY_TIMEOUT_MS = 5000
+
+
+def create_api_engine(url, pool_size, max_overflow, busy_timeout_ms):
+    url = make_url(url)
+    if url.drivername == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return create_async_engine(url)
+
+    engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool,
+                                 pool_size=pool_size, max_overflow=max_overflow)
+    set_sqlite_pragmas(engine.sync_engine, busy_timeout_ms)
+    return engine
+
+
+engine = create_api_engine(DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_BUSY_TIMEOUT_MS)
+AsyncDBSession = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+version_store = FileCatalogVersion(CATALOG_VERSION_FILE) if CATALOG_VERSION_FILE else None
+
+
+async def get_products(db_session, args):
+    after, per_page = page_args(args.get('after'), args.get('per_page'), PRODUCTS_PER_PAGE, MAX_PRODUCTS_PER_PAGE)
+    stmt = keyset_statement(select(Product), Product.product_id, after, per_page)
+    rows = (await db_session.execute(stmt)).scalars().all()
+    products, next_cursor = split_page(rows, Product.product_id, per_page)
+    return {'products': [product_to_dict(product) for product in products], 'next': next_cursor}
+
+
+async def product_batches(db_session):
+    # Every product as lists of dicts, EXPORT_BATCH_SIZE rows at a time, read from
+    # a server-side cursor while earlier batches are being sent
+    result = await db_session.stream(
+        select(Product).order_by(Product.product_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async for products in result.scalars().partitions():
+        yield [product_to_dict(product) for product in products]
+
+
+def stream_format(path, args):
+    # (content type, chunk generator) of a streamed export, or None for a normal response
+    if path != '/api/products':
+        return None
+    if args.get('format') == 'ndjson':
+        return b'application/x-ndjson', async_ndjson_chunks
+    if args.get('stream'):
+        return b'application/json', async_json_array_chunks
+    return None
+
+
+async def get_categories(db_session, args):
+    categories = (await db_session.execute(select(Category))).scalars().all()
+    return [{'id': category.category_id, 'name': category.category_name} for category in categories]
+
+
+ROUTES = {
+    '/api/products': get_products,
+    '/api/categories': get_categories,
+}
+
+
+def _not_modified(headers, etag, last_modified):
+    # Same rules as conditional.not_modified: If-None-Match wins over If-Modified-Since
+    if b'if-none-match' in headers:
+        return parse_etags(headers[b'if-none-match'].decode('latin-1')).contains_weak(etag)
+    if b'if-modified-since' in headers:
+        since = parse_date(headers[b'if-modified-since'].decode('latin-1'))
+        return since is not None and last_modified <= since
+    return False
+
+
+async def _send(send, status, body=b'', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-length', str(len(body)).encode())] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_stream(send, path, content_type, chunks, headers):
+    # Chunked response without a Content-Length; once it has started an error can
+    # only cut the body short, so it is logged and the response ends there
+    start = {'type': 'http.response.start', 'status': 200,
+             'headers': [(b'content-type', content_type)] + list(headers)}
+    response_started = False
+    try:
+        async with AsyncDBSession() as db_session:
+            async for chunk in chunks(product_batches(db_session)):
+                if not response_started:
+                    await send(start)
+                    response_started = True
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    except Exception:
+        logger.exception("API stream failed: %s", path)
+        if not response_started:
+            return await _send(send, 500, dumps({'error': 'internal server error'}),
+                               [(b'content-type', b'application/json')])
+    if not response_started:
+        # Nothing to send (an NDJSON export of an empty catalog): an empty 200
+        await send(start)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    json_type = (b'content-type', b'application/json')
+    route = ROUTES.get(scope['path'])
+    if route is None:
+        return await _send(send, 404, dumps({'error': 'not found'}), [json_type])
+    if scope['method'] not in ('GET', 'HEAD'):
+        return await _send(send, 405, dumps({'error': 'method not allowed'}), [json_type, (b'allow', b'GET, HEAD')])
+
+    query_string = scope['query_string'].decode('latin-1')
+    headers = dict(scope['headers'])
+    response_headers = [json_type]
+
+    if version_store is not None:
+        version, updated_at = version_store.get()
+        etag = catalog_etag(version, updated_at, f"{scope['path']}?{query_string}")
+        last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc)
+        response_headers += [
+            (b'etag', f'"{etag}"'.encode()),
+            (b'last-modified', http_date(last_modified).encode()),
+            (b'cache-control', b'no-cache'),
+            (b'vary', b'Cookie'),
+        ]
+        if _not_modified(headers, etag, last_modified):
+            return await _send(send, 304, headers=response_headers[1:])
+
+    args = dict(parse_qsl(query_string))
+    streamed = stream_format(scope['path'], args)
+    if streamed is not None:
+        content_type, chunks = streamed
+        if scope['method'] == 'HEAD':
+            # The length isn't known without reading the whole catalog
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', content_type)] + response_headers[1:]})
+            return await send({'type': 'http.response.body', 'body': b''})
+        return await _send_stream(send, scope['path'], content_type, chunks, response_headers[1:])
+
+    try:
+        async with AsyncDBSession() as db_session:
+            data = await route(db_session, args)
+    except Exception:
+        logger.exception("API request failed: %s", scope['path'])
+        return await _send(send, 500, dumps({'error': 'internal server error'}), [json_type])
+
+    body = dumps(data)
+    if scope['method'] == 'HEAD':
+        # Same headers as GET, without the body
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-length', str(len(body)).encode())] + response_headers})
+        return await send({'type': 'http.response.body', 'body': b''})
+    await _send(send, 200, body, response_headers)
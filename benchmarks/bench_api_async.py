@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_routes import PROJECT_ROOT, percentile
+
+# Compares the JSON API served by the Flask app (WSGI, one thread per request)
+# with asgi_api.py (ASGI on the async engine) under concurrent load:
+#     python benchmarks/bench_api_async.py --database database/bench.db --concurrency 1,50,500
+#
+# Both servers run as subprocesses against the same copy of the database and
+# are hit by the same asyncio load generator; every request opens its own
+# connection so both servers see the same connection pattern.
+
+WSGI_COMMANDS = {
+    # gunicorn is the production setup; the Werkzeug server is used when it isn't installed
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '--workers', '1', '--threads', '{threads}',
+                 '--bind', '127.0.0.1:{port}', 'wsgi:app'],
+    'werkzeug': [sys.executable, '-c', 'import main; main.create_app().run(host="127.0.0.1", port={port}, threaded=True)'],
+}
+ASGI_COMMAND = [sys.executable, '-m', 'uvicorn', 'asgi_api:app', '--host', '127.0.0.1', '--port', '{port}',
+                '--log-level', 'warning']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def run_load(port, paths, concurrency, total):
+    timings, errors = [], 0
+    queue = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in queue:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, paths[i % len(paths)])
+            except OSError:
+                status = None
+            timings.append((time.perf_counter() - start) * 1000)
+            if status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'rps': total / elapsed,
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'p99_ms': percentile(timings, 99),
+        'errors': errors,
+    }
+
+
+def start_server(command, port, threads, env):
+    args = [part.format(port=port, threads=threads) for part in command]
+    process = subprocess.Popen(args, cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the WSGI and ASGI JSON API under concurrent load.")
+    parser.add_argument('--database', default=os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db'))
+    parser.add_argument('--concurrency', default='1,50,200', help="comma separated numbers of concurrent clients")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument('--wsgi', choices=sorted(WSGI_COMMANDS), help="WSGI server (default: gunicorn if installed)")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads")
+    args = parser.parse_args()
+
+    wsgi = args.wsgi
+    if wsgi is None:
+        wsgi = 'gunicorn' if shutil.which('gunicorn') else 'werkzeug'
+
+    workdir = tempfile.mkdtemp(prefix='bench-api-')
+    database = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(args.database, database)
+    # Note that the Flask views answer repeated pages from their in-process catalog cache
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database, PYTHONPATH=PROJECT_ROOT)
+
+    paths = ['/api/products', '/api/products?after=100&per_page=50', '/api/categories']
+    servers = {f'wsgi ({wsgi})': WSGI_COMMANDS[wsgi], 'asgi (uvicorn)': ASGI_COMMAND}
+
+    print(f"{'server':20} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    try:
+        for name, command in servers.items():
+            port = free_port()
+            process = start_server(command, port, args.threads, env)
+            try:
+                asyncio.run(run_load(port, paths, 1, 20))  # warm up
+                for concurrency in (int(c) for c in args.concurrency.split(',')):
+                    result = asyncio.run(run_load(port, paths, concurrency, args.requests))
+                    print(f"{name:20} {concurrency:8} {result['rps']:9.0f} {result['p50_ms']:9.2f} "
+                          f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f} {result['errors']:7}")
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Per-route benchmark: drives every storefront, API and admin route through the
+# Flask test client and reports latency percentiles and SQL queries per request.
+#
+#     DATABASE_URL=sqlite:///database/bench.db python database/db_creation.py
+#     DATABASE_URL=sqlite:///database/bench.db python database/seed_data.py
+#     python benchmarks/bench_routes.py --database database/bench.db --save before
+#     ... change something ...
+#     python benchmarks/bench_routes.py --database database/bench.db --compare before
+#
+# The database is copied to a temporary file first, so the routes that write
+# (add to cart, checkout) don't change the seeded data between runs.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'baselines')
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'database'))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def pick_ids(app):
+    from sqlalchemy import func, select
+
+    from db import DBSession
+    from models import Admin, Category, Customer, Order, Product
+    from seed_data import CUSTOMER_PASSWORD
+
+    with app.app_context():
+        db_session = DBSession()
+        ids = {
+            'product_ids': db_session.execute(select(Product.product_id)).scalars().all(),
+            'category_ids': db_session.execute(select(Category.category_id)).scalars().all(),
+            'admin_id': db_session.execute(select(Admin.adminid)).scalars().first(),
+            # The customer with the most orders is the worst case for /customer/orders
+            'customer_id': db_session.execute(
+                select(Order.customer_id).group_by(Order.customer_id).order_by(func.count().desc()).limit(1)
+            ).scalar() or db_session.execute(select(Customer.userid)).scalars().first(),
+        }
+        ids['customer_username'] = db_session.execute(
+            select(Customer.username).where(Customer.userid == ids['customer_id'])
+        ).scalar()
+        ids['customer_password'] = CUSTOMER_PASSWORD
+    if not ids['product_ids'] or not ids['category_ids'] or ids['customer_id'] is None:
+        sys.exit("The database has no products, categories or customers. Run database/seed_data.py first.")
+    return ids
+
+
+def build_routes(ids, rng):
+    product_ids = ids['product_ids']
+    category_ids = ids['category_ids']
+    middle = product_ids[len(product_ids) // 2]
+
+    def add_something(client):
+        client.get(f'/add_to_cart/{rng.choice(product_ids)}')
+
+    # name -> (who is logged in, method, path or callable returning one, form data, untimed setup)
+    login = {'username': ids['customer_username'], 'password': ids['customer_password']}
+
+    return {
+        'customer_login': (None, 'POST', '/login', login, None),
+        'index': (None, 'GET', '/', None, None),
+        'index_deep_page': (None, 'GET', f'/?after={middle}', None, None),
+        'view_categories': (None, 'GET', '/view_categories', None, None),
+        'view_products_by_category': (None, 'GET', lambda: f'/view_products/{rng.choice(category_ids)}', None, None),
+        'search': (None, 'GET', lambda: '/search?query=' + rng.choice(['fresh', 'milk', 'organic rice', 'tea', 'ch']),
+                   None, None),
+        'api_products': (None, 'GET', '/api/products', None, None),
+        'api_products_deep_page': (None, 'GET', f'/api/products?after={middle}&per_page=100', None, None),
+        'api_categories': (None, 'GET', '/api/categories', None, None),
+        'view_cart': ('customer', 'GET', '/cart', None, None),
+        'add_to_cart': ('customer', 'GET', lambda: f'/add_to_cart/{rng.choice(product_ids)}', None, None),
+        'add_to_cart_guest': (None, 'GET', lambda: f'/add_to_cart/{rng.choice(product_ids[:40])}', None, None),
+        'checkout': ('customer', 'POST', '/checkout', {'address': '1 Main Road', 'phone': '9000000000'}, add_something),
+        'customer_orders': ('customer', 'GET', '/customer/orders', None, None),
+        'manage_products': ('admin', 'GET', '/manage_products', None, None),
+        'manage_categories': ('admin', 'GET', '/manage_categories', None, None),
+        'manage_customers': ('admin', 'GET', '/manage_customers', None, None),
+        'manage_orders': ('admin', 'GET', '/manage_orders', None, None),
+    }
+
+
+def run_route(app, client, route, requests, warmup, cold_cache):
+    from db import get_engine
+    from query_budgets import count_queries
+
+    _, method, path, data, setup = route
+    engine = get_engine(app)
+    timings, queries = [], []
+    for i in range(warmup + requests):
+        if setup:
+            setup(client)
+        if cold_cache:
+            app.extensions['catalog_cache'].clear()
+            app.extensions['fragment_cache'].clear()
+        url = path() if callable(path) else path
+        with count_queries(engine) as counter:
+            start = time.perf_counter()
+            response = client.open(url, method=method, data=data)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {url} returned {response.status_code}")
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            queries.append(counter['count'])
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries_per_request': round(statistics.mean(queries), 2),
+        'max_queries': max(queries),
+    }
+
+
+def print_results(results, baseline=None):
+    header = f"{'route':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}"
+    if baseline:
+        header += f" {'p95 vs base':>12} {'queries vs base':>16}"
+    print(header)
+    for name, result in results.items():
+        line = (f"{name:28} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} {result['p99_ms']:9.2f} "
+                f"{result['queries_per_request']:8.2f}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f" {result['p95_ms'] / base['p95_ms']:11.2f}x {base['queries_per_request']:>7.2f} -> {result['queries_per_request']:<6.2f}"
+        print(line)
+
+
+def compare(results, baseline, threshold):
+    # Returns the routes that got slower than threshold x baseline p95 or run more queries
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['p95_ms'] > base['p95_ms'] * threshold:
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms")
+        if result['max_queries'] > base['max_queries']:
+            regressions.append(f"{name}: queries {base['max_queries']} -> {result['max_queries']}")
+    return regressions
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, name + '.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every route with the Flask test client.")
+    parser.add_argument('--database', default=os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db'),
+                        help="SQLite file to benchmark against (it is copied, not modified)")
+    parser.add_argument('--requests', type=int, default=200, help="timed requests per route")
+    parser.add_argument('--warmup', type=int, default=20, help="untimed requests per route before measuring")
+    parser.add_argument('--routes', help="comma separated subset of routes to run")
+    parser.add_argument('--cold-cache', action='store_true', help="clear the catalog and fragment caches before every request")
+    parser.add_argument('--save', metavar='NAME', help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='NAME', help="compare with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="with --compare, fail if a route's p95 is this many times the baseline")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    database = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(args.database, database)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.chdir(PROJECT_ROOT)
+
+    try:
+        from main import create_app
+
+        # Over-budget routes show up in the queries column, don't log every request;
+        # no job worker polling the database between timed requests
+        app = create_app({'QUERY_BUDGET_ENFORCED': False, 'JOB_WORKER_THREADS': 0})
+        app.logger.setLevel(logging.ERROR)
+        ids = pick_ids(app)
+        routes = build_routes(ids, random.Random(args.seed))
+        if args.routes:
+            routes = {name: routes[name] for name in args.routes.split(',')}
+
+        results = {}
+        for name, route in routes.items():
+            client = app.test_client()
+            with client.session_transaction() as session:
+                if route[0] == 'customer':
+                    session['customer_id'] = ids['customer_id']
+                elif route[0] == 'admin':
+                    session['admin_id'] = ids['admin_id']
+            results[name] = run_route(app, client, route, args.requests, args.warmup, args.cold_cache)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)['routes']
+    print_results(results, baseline)
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'database': os.path.basename(args.database), 'requests': args.requests,
+                       'cold_cache': args.cold_cache, 'routes': results}, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
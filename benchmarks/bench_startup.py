@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_routes import PROJECT_ROOT, baseline_path, percentile
+
+# Startup benchmark: how long a fresh worker process takes to import the app,
+# build it and answer its first request.
+#
+#     python benchmarks/bench_startup.py --runs 20 --save startup
+#     python benchmarks/bench_startup.py --runs 20 --compare startup
+#
+# Every run is a new Python process (like a preforked worker or a test run), so
+# nothing is shared between runs except the OS file cache and the files the app
+# leaves behind (compiled templates, static/dist). Reported per run:
+#   import         import main
+#   create_app     create_app(--profile)
+#   first_request  the first GET --path through the test client, which also
+#                  creates the engine and connects
+#   process        from starting the interpreter to having that first response
+# --import-times N also lists the N slowest modules imported by main (from
+# python -X importtime), i.e. what a lazier import would save.
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from main import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[2])
+answered = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'create_app': (created - imported) * 1000,
+    'first_request': (answered - created) * 1000,
+    'answered_at': time.time(),
+    'status': response.status_code,
+}))
+"""
+
+PHASES = ('import', 'create_app', 'first_request', 'process')
+
+
+def run_once(profile, path, env):
+    started = time.time()
+    output = subprocess.run([sys.executable, '-c', CHILD, profile, path], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    if result['status'] >= 400:
+        raise RuntimeError(f"GET {path} returned {result['status']}")
+    result['process'] = (result.pop('answered_at') - started) * 1000
+    return result
+
+
+def import_times(env, count):
+    # Cumulative ms of each module main imports directly, from the interpreter's own report
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=PROJECT_ROOT,
+                            env=env, capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two more spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1 and cumulative.strip().isdigit():
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request in fresh processes.")
+    parser.add_argument('--database', default=os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db'),
+                        help="SQLite file to answer the first request from (it is copied, not modified)")
+    parser.add_argument('--runs', type=int, default=10, help="fresh processes to start")
+    parser.add_argument('--profile', default='development', help="config profile passed to create_app()")
+    parser.add_argument('--path', default='/', help="URL of the first request")
+    parser.add_argument('--import-times', type=int, default=0, metavar='N',
+                        help="also list the N slowest modules imported by main")
+    parser.add_argument('--save', metavar='NAME', help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='NAME', help="compare with a saved baseline")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="with --compare, fail if a phase's median is this many times the baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    database = os.path.join(workdir, 'startup.db')
+    shutil.copyfile(args.database, database)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + database)
+
+    try:
+        # One untimed run writes the bytecode, template and static caches a deployed worker would find
+        run_once(args.profile, args.path, env)
+        runs = [run_once(args.profile, args.path, env) for _ in range(args.runs)]
+        slowest_imports = import_times(env, args.import_times) if args.import_times else []
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {}
+    for phase in PHASES:
+        timings = [run[phase] for run in runs]
+        results[phase] = {
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+        }
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as f:
+            baseline = json.load(f)['phases']
+
+    print(f"{args.runs} fresh processes, profile {args.profile!r}, first request GET {args.path}")
+    header = f"{'phase':16} {'median ms':>10} {'p95 ms':>9} {'max ms':>9}"
+    print(header + (f" {'median vs base':>15}" if baseline else ''))
+    for phase, result in results.items():
+        line = f"{phase:16} {result['median_ms']:10.2f} {result['p95_ms']:9.2f} {result['max_ms']:9.2f}"
+        if baseline and phase in baseline:
+            line += f" {result['median_ms'] / baseline[phase]['median_ms']:14.2f}x"
+        print(line)
+
+    if slowest_imports:
+        print("\nslowest imports of main (cumulative ms):")
+        for ms, name in slowest_imports:
+            print(f"  {ms:8.1f}  {name}")
+
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'runs': args.runs, 'profile': args.profile, 'path': args.path, 'phases': results}, f, indent=2)
+        print(f"Saved baseline to {path}")
+
+    if baseline:
+        regressions = [
+            f"{phase}: median {baseline[phase]['median_ms']:.2f} ms -> {result['median_ms']:.2f} ms"
+            for phase, result in results.items()
+            if phase in baseline and result['median_ms'] > baseline[phase]['median_ms'] * args.threshold
+        ]
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_routes import PROJECT_ROOT, percentile
+
+# Concurrency stress test for stock reservation at checkout:
+#     python benchmarks/stress_checkout.py --customers 200 --stock 50 --workers 32
+#
+# Works on a copy of the database. A hot product gets --stock units, and each
+# of --customers new customers puts --quantity of it plus one unit of a second,
+# well stocked product in their cart. All of them then check out at the same
+# moment from --workers threads. Afterwards it checks that
+#   - the hot product's stock never went below zero,
+#   - units ordered + stock left = stock at the start, for both products (no
+#     lost updates, and a rejected checkout took nothing),
+#   - every customer either has an order or still has their full cart,
+# and exits with status 1 if any of that doesn't hold.
+
+
+def setup(app, customers, stock, quantity):
+    from sqlalchemy import insert, select
+
+    from db import DBSession
+    from models import Cart, CartItem, Customer, Product
+
+    with app.app_context():
+        db_session = DBSession()
+        hot, cold = db_session.execute(select(Product.product_id).order_by(Product.product_id).limit(2)).scalars()
+        db_session.query(Product).filter_by(product_id=hot).update({'stock_quantity': stock})
+        db_session.query(Product).filter_by(product_id=cold).update({'stock_quantity': customers})
+
+        prefix = f'stress-{int(time.time())}-'
+        db_session.execute(insert(Customer), [{'username': f'{prefix}{i}', 'password': '!'} for i in range(customers)])
+        customer_ids = db_session.execute(
+            select(Customer.userid).where(Customer.username.startswith(prefix))
+        ).scalars().all()
+        db_session.execute(insert(Cart), [{'customer_id': customer_id} for customer_id in customer_ids])
+        cart_ids = db_session.execute(select(Cart.cart_id).where(Cart.customer_id.in_(customer_ids))).scalars().all()
+        db_session.execute(insert(CartItem), [
+            {'cart_id': cart_id, 'product_id': product_id, 'quantity': amount, 'price': 1.0}
+            for cart_id in cart_ids for product_id, amount in ((hot, quantity), (cold, 1))
+        ])
+        db_session.commit()
+    return hot, cold, customer_ids
+
+
+def check_out(app, customer_id, start):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['customer_id'] = customer_id
+    start.wait()
+    started = time.perf_counter()
+    response = client.post('/checkout', data={'address': '1 Main Road', 'phone': '9000000000'})
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with client.session_transaction() as session:
+        messages = [message for _, message in session.get('_flashes', [])]
+    return response.headers.get('Location'), messages, elapsed_ms
+
+
+def verify(app, hot, cold, customer_ids, stock):
+    from sqlalchemy import func, select
+
+    from db import DBSession
+    from models import Cart, CartItem, Order, OrderLine, Product
+
+    with app.app_context():
+        db_session = DBSession()
+        stock_left = dict(db_session.execute(
+            select(Product.product_id, Product.stock_quantity).where(Product.product_id.in_([hot, cold]))
+        ).all())
+        ordered = dict(db_session.execute(
+            select(OrderLine.product_id, func.sum(OrderLine.quantity))
+            .join(Order, Order.order_id == OrderLine.order_id)
+            .where(Order.customer_id.in_(customer_ids))
+            .group_by(OrderLine.product_id)
+        ).all())
+        ordering = set(db_session.execute(
+            select(Order.customer_id).where(Order.customer_id.in_(customer_ids))
+        ).scalars())
+        full_carts = set(db_session.execute(
+            select(Cart.customer_id).join(CartItem, CartItem.cart_id == Cart.cart_id)
+            .where(Cart.customer_id.in_(customer_ids))
+            .group_by(Cart.customer_id).having(func.count() == 2)
+        ).scalars())
+
+    problems = []
+    if stock_left[hot] < 0:
+        problems.append(f"hot product stock is {stock_left[hot]}")
+    for product_id, start_stock in ((hot, stock), (cold, len(customer_ids))):
+        sold = ordered.get(product_id, 0)
+        if sold + stock_left[product_id] != start_stock:
+            problems.append(f"product {product_id}: {sold} ordered + {stock_left[product_id]} left != {start_stock}")
+    if ordering & full_carts:
+        problems.append(f"{len(ordering & full_carts)} customers have an order and still a full cart")
+    if len(ordering) + len(full_carts) != len(customer_ids):
+        problems.append(f"{len(customer_ids) - len(ordering) - len(full_carts)} customers have neither")
+    return len(ordering), stock_left[hot], problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check out many carts at once and check that no stock is oversold.")
+    parser.add_argument('--database', default=os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db'),
+                        help="SQLite file to start from (it is copied, not modified)")
+    parser.add_argument('--customers', type=int, default=200, help="concurrent checkouts")
+    parser.add_argument('--stock', type=int, default=50, help="starting stock of the hot product")
+    parser.add_argument('--quantity', type=int, default=1, help="units of the hot product in each cart")
+    parser.add_argument('--workers', type=int, default=32, help="threads checking out at the same time")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='stress-')
+    database = os.path.join(workdir, 'stress.db')
+    shutil.copyfile(args.database, database)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.chdir(PROJECT_ROOT)
+
+    try:
+        from main import create_app
+
+        app = create_app({'QUERY_BUDGET_ENFORCED': False, 'JOB_WORKER_THREADS': 0})
+        app.logger.setLevel(logging.ERROR)
+        hot, cold, customer_ids = setup(app, args.customers, args.stock, args.quantity)
+        # Every thread logs in first, then they all check out at once
+        start = threading.Event()
+        with ThreadPoolExecutor(args.workers) as pool:
+            futures = pool.map(lambda customer_id: check_out(app, customer_id, start), customer_ids)
+            start.set()
+            results = list(futures)
+
+        orders, stock_left, problems = verify(app, hot, cold, customer_ids, args.stock)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    placed = sum(1 for location, _, _ in results if location == '/')
+    out_of_stock = sum(1 for _, messages, _ in results if any('stock' in message for message in messages))
+    failed = len(results) - placed - out_of_stock
+    timings = [elapsed_ms for _, _, elapsed_ms in results]
+    expected = min(len(customer_ids), args.stock // args.quantity)
+
+    print(f"{len(results)} checkouts with {args.workers} threads: {placed} placed, "
+          f"{out_of_stock} rejected for stock, {failed} failed")
+    print(f"checkout latency p50 {percentile(timings, 50):.1f} ms, p95 {percentile(timings, 95):.1f} ms, "
+          f"p99 {percentile(timings, 99):.1f} ms")
+    print(f"{orders} orders in the database, hot product stock left: {stock_left} "
+          f"(at most {expected} orders could be filled)")
+    if placed != orders:
+        problems.append(f"{placed} checkouts reported success but {orders} orders exist")
+    if orders > expected:
+        problems.append(f"{orders} orders for stock that covers {expected}")
+
+    for problem in problems:
+        print("OVERSOLD / INCONSISTENT: " + problem)
+    if problems:
+        sys.exit(1)
+    print("OK: no overselling and no lost updates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+from collections import namedtuple
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Cart, CartItem, Product
+
+# Cart writes done as single upsert statements.
+#
+# carts.customer_id and cart_items(cart_id, product_id) are unique, so adding a
+# product is one INSERT ... SELECT ... ON CONFLICT DO UPDATE: it looks up the
+# customer's cart and the product price, inserts the item or bumps the quantity
+# of the existing one, all in one round-trip and without a read-then-write race.
+# Neither happens when the cart would then hold more than the product's stock;
+# the stock itself is only taken at checkout (see inventory.py).
+#
+# Visitors who aren't logged in get a guest cart instead: a {product_id: quantity}
+# dict in the signed session cookie, so browsing and adding to it writes nothing
+# to the database. When the visitor logs in it is merged into their cart with
+# one more upsert, and since most carts are abandoned most never reach the
+# database at all.
+
+# Distinct products in a guest cart; the whole session has to fit in a 4 KB cookie
+GUEST_CART_MAX_ITEMS = 50
+GUEST_CART_MAX_QUANTITY = 99
+
+# Quacks like a CartItem with its product loaded, for rendering the cart page
+GuestCartItem = namedtuple('GuestCartItem', ['product_id', 'product', 'quantity', 'price'])
+
+
+def ensure_cart(db_session, customer_id):
+    db_session.execute(
+        insert(Cart).values(customer_id=customer_id).on_conflict_do_nothing(index_elements=['customer_id'])
+    )
+
+
+def _upsert_items_stmt(customer_id, product_id, quantity):
+    stmt = insert(CartItem).from_select(
+        ['cart_id', 'product_id', 'quantity', 'price'],
+        select(Cart.cart_id, Product.product_id, literal(quantity), Product.product_price)
+        .join(Product, Product.product_id == product_id)
+        .where(Cart.customer_id == customer_id, Product.stock_quantity >= quantity)
+    )
+    stock = select(Product.stock_quantity).where(Product.product_id == product_id).scalar_subquery()
+    return stmt.on_conflict_do_update(
+        index_elements=['cart_id', 'product_id'],
+        set_={'quantity': CartItem.quantity + stmt.excluded.quantity},
+        where=CartItem.quantity + stmt.excluded.quantity <= stock
+    )
+
+
+def add_product_to_cart(db_session, customer_id, product_id, quantity=1):
+    # Returns False if the product doesn't exist or doesn't have enough stock. The caller commits.
+    result = db_session.execute(_upsert_items_stmt(customer_id, product_id, quantity))
+    if result.rowcount:
+        return True
+
+    # Nothing was written: either the customer has no cart row yet (accounts
+    # created before carts were made at registration) or the product is missing
+    # or out of stock
+    ensure_cart(db_session, customer_id)
+    result = db_session.execute(_upsert_items_stmt(customer_id, product_id, quantity))
+    return bool(result.rowcount)
+
+
+def add_to_guest_cart(guest_cart, product_id, quantity=1):
+    # Returns the new guest cart, or None if it already holds GUEST_CART_MAX_ITEMS products.
+    # Keys are strings because the session is stored as JSON.
+    key = str(product_id)
+    if key not in guest_cart and len(guest_cart) >= GUEST_CART_MAX_ITEMS:
+        return None
+    return dict(guest_cart, **{key: min(guest_cart.get(key, 0) + quantity, GUEST_CART_MAX_QUANTITY)})
+
+
+def set_guest_cart_quantity(guest_cart, product_id, quantity):
+    # Returns the new guest cart; a quantity of 0 or less removes the product
+    guest_cart = dict(guest_cart)
+    if quantity > 0:
+        guest_cart[str(product_id)] = min(quantity, GUEST_CART_MAX_QUANTITY)
+    else:
+        guest_cart.pop(str(product_id), None)
+    return guest_cart
+
+
+def get_guest_cart_items(db_session, guest_cart):
+    # One query for all the products; products deleted since they were added are left out
+    product_ids = [int(product_id) for product_id in guest_cart]
+    if not product_ids:
+        return []
+    products = {product.product_id: product
+                for product in db_session.query(Product).filter(Product.product_id.in_(product_ids))}
+    return [GuestCartItem(product_id, products[product_id], guest_cart[str(product_id)],
+                          products[product_id].product_price)
+            for product_id in product_ids if product_id in products]
+
+
+def _merge_items_stmt(customer_id, guest_cart):
+    quantities = {int(product_id): quantity for product_id, quantity in guest_cart.items()}
+    stmt = insert(CartItem).from_select(
+        ['cart_id', 'product_id', 'quantity', 'price'],
+        select(Cart.cart_id, Product.product_id,
+               func.min(case(quantities, value=Product.product_id), Product.stock_quantity),
+               Product.product_price)
+        .join(Product, Product.product_id.in_(list(quantities)))
+        .where(Cart.customer_id == customer_id, Product.stock_quantity > 0)
+    )
+    # A product that is in both carts keeps the larger quantity: it was usually
+    # picked again while logged out, not wanted twice
+    return stmt.on_conflict_do_update(
+        index_elements=['cart_id', 'product_id'],
+        set_={'quantity': func.max(CartItem.quantity, stmt.excluded.quantity)}
+    )
+
+
+def merge_guest_cart(db_session, customer_id, guest_cart):
+    # Moves a guest cart into the customer's cart with one upsert, capping each
+    # quantity at the stock on hand and skipping products that are gone or sold
+    # out. The caller commits.
+    if not guest_cart:
+        return
+    result = db_session.execute(_merge_items_stmt(customer_id, guest_cart))
+    if not result.rowcount:
+        # Either nothing could be added or the customer has no cart row yet
+        ensure_cart(db_session, customer_id)
+        db_session.execute(_merge_items_stmt(customer_id, guest_cart))
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# In-process cache for read-mostly catalog data (products, categories).
+#
+# Entries are keyed by the current catalog version. Admin routes that change the
+# catalog call bump(), which moves every worker that sees the new version onto a
+# fresh, empty cache. Entries also expire after a TTL and the cache holds at most
+# max_entries values, evicting the least recently used one first.
+
+
+class LocalCatalogVersion:
+    # Version counter kept in this process only (fine for a single worker)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 1
+        self._updated_at = time.time()
+
+    def get(self):
+        return self._version, self._updated_at
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+            self._updated_at = time.time()
+            return self._version
+
+
+class FileCatalogVersion:
+    # Version counter stored in a small file so every worker process on the
+    # machine sees the same version. Reads only stat() the file and re-read it
+    # when it changed: bump() replaces the file, so the inode changes even when
+    # two bumps land within one mtime tick. Inodes can be reused, so the file is
+    # also re-read at least every recheck_seconds.
+
+    def __init__(self, path, recheck_seconds=1.0):
+        self.path = path
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._stat_key = None
+        self._read_at = 0.0
+        self._value = (0, 0.0)
+        if not os.path.exists(path):
+            self._write(1, time.time())
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                version, updated_at = f.read().split()
+            return int(version), float(updated_at)
+        except (OSError, ValueError):
+            return 0, 0.0
+
+    def _write(self, version, updated_at):
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(f'{version} {updated_at}')
+        os.replace(tmp_path, self.path)
+
+    def get(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return self._value
+        stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        now = time.monotonic()
+        if stat_key != self._stat_key or now - self._read_at >= self.recheck_seconds:
+            self._value = self._read()
+            self._stat_key, self._read_at = stat_key, now
+        return self._value
+
+    def bump(self):
+        with self._lock, open(f'{self.path}.lock', 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            version = self._read()[0] + 1
+            self._write(version, time.time())
+            return version
+
+
+class CatalogCache:
+    def __init__(self, version_store, max_entries=512, ttl=300):
+        self.version_store = version_store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+
+    @property
+    def version(self):
+        return self.version_store.get()[0]
+
+    def get_or_load(self, key, loader):
+        version = self.version
+        now = time.monotonic()
+
+        with self._lock:
+            if version != self._version:
+                # The catalog changed (possibly in another worker): drop everything
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = loader()
+
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def bump(self):
+        return self.version_store.bump()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def create_catalog_cache(version_file=None, max_entries=512, ttl=300):
+    version_store = FileCatalogVersion(version_file) if version_file else LocalCatalogVersion()
+    return CatalogCache(version_store, max_entries=max_entries, ttl=ttl)
@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+import math
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Category, Product
+
+# Bulk catalog import and export.
+#
+# A catalog file has one product per row, keyed by SKU:
+#     sku,name,price,category,description,stock
+# as CSV (with that header) or as NDJSON (one {"sku": ..., ...} object per line).
+# stock is optional: a row without it leaves an existing product's stock as it
+# is, and a new product without it starts with none (the report counts those).
+# Rows are read as a stream, validated and written in chunks of chunk_size rows:
+# each chunk is one transaction with one INSERT ... ON CONFLICT (sku) DO UPDATE,
+# so re-importing a file updates the products instead of duplicating them.
+# Categories are matched by name (case-insensitive) from a map loaded once and
+# created on the fly when a name is new. Invalid rows are skipped and reported.
+#
+# export_catalog() writes the same format back, so an export can be edited and
+# imported again.
+
+FIELDS = ['sku', 'name', 'price', 'category', 'description', 'stock']
+FORMATS = ('csv', 'ndjson')
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.categories_created = 0
+        self.added_without_stock = 0  # New products with no stock column value, which can't be sold yet
+        self.errors = []  # (line number, message), at most MAX_REPORTED_ERRORS
+        self.error_count = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        summary = (f"{self.rows} rows read: {self.inserted} products added, {self.updated} updated, "
+                   f"{self.categories_created} categories created, {self.error_count} rows skipped")
+        if self.added_without_stock:
+            summary += f" ({self.added_without_stock} products added without stock)"
+        return summary
+
+
+def default_sku(product_id):
+    # SKU given to products created without one (same scheme as migration 0003)
+    return f'P{product_id:06d}'
+
+
+def detect_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def read_rows(binary_stream, file_format):
+    # Yields (line number, dict) without reading the whole file into memory
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+
+def validate_row(row):
+    # Returns (clean row, None) or (None, error message)
+    if row is None:
+        return None, "not a JSON object"
+
+    def text(field):
+        value = row.get(field)
+        return '' if value is None else str(value).strip()
+
+    sku, name, category = text('sku'), text('name'), text('category')
+    if not sku:
+        return None, "sku is required"
+    if not name:
+        return None, "name is required"
+    if not category:
+        return None, "category is required"
+    try:
+        price = float(text('price'))
+    except ValueError:
+        return None, f"price {text('price')!r} is not a number"
+    if not math.isfinite(price) or price < 0:
+        return None, f"price {price} must be zero or more"
+    stock = None
+    if text('stock'):
+        try:
+            stock = int(text('stock'))
+        except ValueError:
+            return None, f"stock {text('stock')!r} is not a whole number"
+        if stock < 0:
+            return None, f"stock {stock} must be zero or more"
+
+    return {'sku': sku, 'product_name': name, 'product_price': price,
+            'category': category, 'description': text('description') or None,
+            'stock_quantity': stock}, None
+
+
+def _category_key(name):
+    return ' '.join(name.split()).lower()
+
+
+def load_category_ids(db_session):
+    return {_category_key(name): category_id
+            for category_id, name in db_session.execute(select(Category.category_id, Category.category_name))}
+
+
+def _resolve_categories(db_session, rows, category_ids, report):
+    # Creates the categories of this chunk that don't exist yet and fills in category_id
+    new_names = {}
+    for row in rows:
+        key = _category_key(row['category'])
+        if key not in category_ids:
+            new_names.setdefault(key, ' '.join(row['category'].split()))
+    if new_names:
+        db_session.execute(insert(Category), [{'category_name': name} for name in new_names.values()])
+        # Looked up by the exact names just written and keyed in Python: SQLite's
+        # lower() only folds ASCII, so it can't match the keys of names like 'Épices'
+        created = db_session.execute(
+            select(Category.category_id, Category.category_name)
+            .where(Category.category_name.in_(list(new_names.values())))
+        )
+        for category_id, name in created:
+            category_ids.setdefault(_category_key(name), category_id)
+        report.categories_created += len(new_names)
+
+    for row in rows:
+        row['category_id'] = category_ids[_category_key(row.pop('category'))]
+
+
+def _write_chunk(db_session, rows, category_ids, report):
+    # Later rows win when a SKU appears twice in the same chunk
+    rows = list({row['sku']: row for row in rows}.values())
+    _resolve_categories(db_session, rows, category_ids, report)
+
+    skus = [row['sku'] for row in rows]
+    existing = set(db_session.execute(select(Product.sku).where(Product.sku.in_(skus))).scalars())
+
+    # A multi-row INSERT needs the same columns in every row: rows with a stock
+    # value set it, rows without one keep the stock of the product they update
+    with_stock = [row for row in rows if row['stock_quantity'] is not None]
+    without_stock = [dict(row, stock_quantity=0) for row in rows if row['stock_quantity'] is None]
+    for chunk_rows, update_stock in ((with_stock, True), (without_stock, False)):
+        if not chunk_rows:
+            continue
+        stmt = insert(Product).values(chunk_rows)
+        set_ = {
+            'product_name': stmt.excluded.product_name,
+            'product_price': stmt.excluded.product_price,
+            'description': stmt.excluded.description,
+            'category_id': stmt.excluded.category_id,
+        }
+        if update_stock:
+            set_['stock_quantity'] = stmt.excluded.stock_quantity
+        db_session.execute(stmt.on_conflict_do_update(index_elements=['sku'], set_=set_))
+    db_session.commit()
+    report.updated += len(existing)
+    report.inserted += len(rows) - len(existing)
+    report.added_without_stock += sum(1 for row in without_stock if row['sku'] not in existing)
+
+
+def import_catalog(db_session, binary_stream, file_format, chunk_size=1000, progress=None):
+    # Imports a CSV/NDJSON stream and returns an ImportReport. progress(report) is
+    # called after every committed chunk. A chunk that fails to write is rolled
+    # back and the exception is raised; chunks before it stay committed.
+    report = ImportReport()
+    category_ids = load_category_ids(db_session)
+    # SQLite allows at most 32766 bound parameters per statement, 6 per row
+    chunk_size = max(1, min(chunk_size, 5000))
+    chunk = []
+
+    def flush():
+        try:
+            _write_chunk(db_session, chunk, category_ids, report)
+        except Exception:
+            db_session.rollback()
+            raise
+        chunk.clear()
+        if progress:
+            progress(report)
+
+    for line_number, row in read_rows(binary_stream, file_format):
+        report.rows += 1
+        clean, error = validate_row(row)
+        if error:
+            report.add_error(line_number, error)
+            continue
+        chunk.append(clean)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
+
+
+def export_catalog(db_session, file_format, batch_size=1000):
+    # Yields the whole catalog as CSV or NDJSON text chunks, batch_size rows at a time
+    result = db_session.execute(
+        select(Product.sku, Product.product_id, Product.product_name, Product.product_price,
+               Category.category_name, Product.description, Product.stock_quantity)
+        .outerjoin(Category, Product.category_id == Category.category_id)
+        .order_by(Product.product_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if file_format == 'csv':
+        writer.writerow(FIELDS)
+
+    for rows in result.partitions():
+        for sku, product_id, name, price, category, description, stock in rows:
+            values = [sku or default_sku(product_id), name, price, category or '', description or '', stock]
+            if file_format == 'csv':
+                writer.writerow(values)
+            else:
+                buffer.write(json.dumps(dict(zip(FIELDS, values))) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,54 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+# Conditional GET (ETag / Last-Modified) for catalog responses.
+#
+# Catalog pages only change when the catalog version is bumped, so the ETag is
+# derived from that version (and when it was set) plus the request path and
+# query string. A client that sends a matching If-None-Match (or an
+# If-Modified-Since that is not older than the last catalog change) gets a 304
+# before the view runs any query or serializes anything.
+
+
+def catalog_etag(version, updated_at, full_path=None):
+    # updated_at is part of the hash so a version counter that restarts with the
+    # process can never produce an ETag a client already holds for other content.
+    # full_path ("/path?query") defaults to the current Flask request's.
+    key = f'{version}:{updated_at}:{full_path or request.full_path}'
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return f'catalog-{version}-{digest}'
+
+
+def not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def catalog_conditional(catalog_cache):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, updated_at = catalog_cache.version_store.get()
+            etag = catalog_etag(version, updated_at)
+            last_modified = datetime.fromtimestamp(int(updated_at), timezone.utc)
+
+            if not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Let clients keep a copy but revalidate it on every use
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,105 @@
+import os
+
+# Configuration profiles for create_app() in main.py.
+#
+#     create_app()               # APP_CONFIG environment variable, 'development' if unset
+#     create_app('production')
+#     create_app({'DATABASE_URL': 'sqlite:///other.db'})  # overrides on top of the APP_CONFIG profile
+#
+# Values that differ between deployments are read from environment variables.
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'Secret_Key')  # Replace with a strong secret key
+    UPLOAD_FOLDER = 'static/uploads'  # Directory for storing product images
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # Limit file size to 16MB
+    PRODUCTS_PER_PAGE = 24  # Default page size for the storefront and /api/products
+    MAX_PRODUCTS_PER_PAGE = 100  # Upper bound for the ?per_page= parameter
+    SEARCH_RESULTS_PER_PAGE = 24
+    # Order history pages; keep the maximum under 500, SQLAlchemy's selectinload batch,
+    # so an order page loads all its lines in one query
+    ORDERS_PER_PAGE = 50
+    MAX_ORDERS_PER_PAGE = 200
+    EXPORT_BATCH_SIZE = 500  # Rows read per round-trip by the streaming /api/products export
+    IMPORT_CHUNK_SIZE = 1000  # Products written per transaction by the bulk catalog import
+    CATALOG_CACHE_MAX_ENTRIES = 512  # Cached catalog pages/lists per worker
+    CATALOG_CACHE_TTL = 300  # Seconds before a cached entry is reloaded anyway
+    FRAGMENT_CACHE_MAX_ENTRIES = 5000  # Rendered product tiles kept per worker
+    FRAGMENT_CACHE_TTL = 300
+    # Compiled templates are kept here for the next worker (None: a directory under the system temp dir)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    # Set to a file path to share the catalog version between worker processes
+    CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE')
+
+    # argon2id cost (see `flask calibrate-passwords`) and the login verification pool
+    PASSWORD_HASH_TIME_COST = 3
+    PASSWORD_HASH_MEMORY_COST = 64 * 1024  # KiB
+    PASSWORD_HASH_PARALLELISM = 4
+    PASSWORD_VERIFY_WORKERS = 4  # Hashes verified at the same time per process
+    PASSWORD_VERIFY_QUEUE = 16  # Logins allowed to wait for a worker before answering 503
+    PASSWORD_VERIFY_TIMEOUT = 5  # Seconds a login waits for its hash to be checked
+
+    # Fingerprinted, precompressed static files and gzip for large HTML/JSON responses
+    STATIC_BUILD_ON_STARTUP = True  # False when `flask build-static` runs at deploy time
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 1024  # Smaller responses aren't worth compressing
+    COMPRESS_LEVEL = 6
+
+    # Database; the engine is only created when the first request (or command) uses it
+    DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///database/mygrocerystore.db')
+    DB_POOL_SIZE = 5  # Connections kept open per worker process
+    DB_MAX_OVERFLOW = 10  # Extra connections allowed under bursts
+    DB_BUSY_TIMEOUT_MS = 5000  # How long a writer waits for the SQLite lock
+    # Read replicas for the catalog views, comma separated (see database/replica_sync.py)
+    DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+    # How far the replicas may be behind: reads within this long of a visitor's
+    # own write, or of a catalog change, go to the primary
+    REPLICA_LAG_SECONDS = float(os.environ.get('REPLICA_LAG_SECONDS', 5))
+
+    # Background jobs (jobs.py): worker threads inside each web process (0: only
+    # `flask run-worker` runs jobs), retry backoff and when a running job counts as abandoned
+    JOB_WORKER_THREADS = 1
+    JOB_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before looking for jobs again
+    JOB_RETRY_BASE_SECONDS = 5
+    JOB_RETRY_MAX_SECONDS = 3600
+    JOB_LOCK_TIMEOUT_SECONDS = 600
+
+    SERVER_TIMING_ENABLED = True  # Send SQL/template/total time in a Server-Timing header
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for scraping /admin/metrics
+    # Statements slower than this are logged with their query plan (None turns the log off)
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    SLOW_QUERY_LOG_FULL_SCANS = True  # Also log each full-table-scan SELECT once
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    # Run `flask build-static` when deploying, so workers only read the manifest
+    STATIC_BUILD_ON_STARTUP = False
+    # Jobs run in `flask run-worker` processes, not in the web workers, so the catalog
+    # version they bump (new thumbnails) has to be shared through a file
+    JOB_WORKER_THREADS = 0
+    CATALOG_VERSION_FILE = os.environ.get('CATALOG_VERSION_FILE', 'database/catalog_version')
+
+
+class TestingConfig(Config):
+    TESTING = True  # Also makes routes over their query budget raise
+    # Never the store's own database: an empty in-memory one unless TEST_DATABASE_URL is set
+    DATABASE_URL = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+    STATIC_BUILD_ON_STARTUP = False
+    SLOW_QUERY_THRESHOLD_MS = None
+    JOB_WORKER_THREADS = 0  # Run queued jobs explicitly with jobs.start_workers(..., burst=True)
+    # Cheap hashes: tests log in far more often than people do
+    PASSWORD_HASH_TIME_COST = 1
+    PASSWORD_HASH_MEMORY_COST = 8 * 1024
+    PASSWORD_HASH_PARALLELISM = 1
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
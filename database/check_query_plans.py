@@ -0,0 +1,60 @@
+import os
+import sys
+
+from sqlalchemy import create_engine, select
+
+# Runs EXPLAIN QUERY PLAN on the hot storefront queries and fails if any of them
+# scans a table it filters on instead of searching an index.
+#     python database/check_query_plans.py
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from db import FULL_SCAN, explain_query_plan  # noqa: E402
+from jobs import ready_jobs  # noqa: E402
+from models import Cart, CartItem, Order, OrderLine, Product  # noqa: E402
+
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db')
+)
+
+# (description, statement) - every table in a statement is expected to be searched
+HOT_QUERIES = [
+    ("category page (view_products_by_category)",
+     select(Product).where(Product.category_id == 1)),
+    ("category delete check (manage_categories)",
+     select(Product.product_id).where(Product.category_id == 1).limit(1)),
+    ("order history (customer_orders)",
+     select(Order).where(Order.customer_id == 1)),
+    ("order lines of listed orders (selectinload)",
+     select(OrderLine).where(OrderLine.order_id.in_([1, 2, 3]))),
+    ("cart page and checkout (get_cart_items)",
+     select(CartItem).join(Cart).where(Cart.customer_id == 1)),
+    ("next job for a worker (jobs.claim_job, polled by every idle worker)",
+     ready_jobs(600)),
+]
+
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    failures = 0
+
+    with engine.connect() as connection:
+        for description, statement in HOT_QUERIES:
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+            plan = explain_query_plan(connection.connection, sql)
+            scans = [line for line in plan if FULL_SCAN.match(line)]
+
+            print(f"{'FAIL' if scans else 'ok  '} {description}")
+            for line in plan:
+                print(f"       {line}")
+            failures += bool(scans)
+
+    if failures:
+        print(f"{failures} hot queries do a full table scan")
+        sys.exit(1)
+    print("All hot queries use an index.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+# Keeps SQLite read replicas in step with the primary, to try replica routing
+# (DATABASE_REPLICA_URLS, see db.py) on one machine:
+#     DATABASE_REPLICA_URLS=sqlite:///database/replica.db python database/replica_sync.py --interval 2
+#     DATABASE_REPLICA_URLS=sqlite:///database/replica.db FLASK_APP=main flask run
+#
+# Every pass copies the whole primary into each replica with SQLite's online
+# backup API, in a single step: the replica moves from the previous copy to the
+# new one in one transaction, so the app's open connections to it keep working
+# and never read a half-copied file. Set REPLICA_LAG_SECONDS in the app to more
+# than --interval plus the time a copy takes.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from search_index import ensure_search_index  # noqa: E402
+
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db')
+)
+DATABASE_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+
+
+def sqlite_path(url):
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        sys.exit(f"{url} is not an SQLite file; use the database's own replication instead")
+    return url.database
+
+
+def copy_database(primary_path, replica_path, busy_timeout_ms=5000):
+    source = sqlite3.connect(primary_path, timeout=busy_timeout_ms / 1000)
+    target = sqlite3.connect(replica_path, timeout=busy_timeout_ms / 1000)
+    try:
+        # pages=-1: one step, so the primary's writers never force the copy to restart
+        source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the primary SQLite database into its read replicas.")
+    parser.add_argument('--primary', default=DATABASE_URL, help="primary database URL (default: DATABASE_URL)")
+    parser.add_argument('--replica', action='append', dest='replicas',
+                        help="replica database URL, may be repeated (default: DATABASE_REPLICA_URLS)")
+    parser.add_argument('--interval', type=float, default=2,
+                        help="seconds between copies; 0 copies once and exits")
+    args = parser.parse_args()
+
+    replicas = args.replicas or DATABASE_REPLICA_URLS
+    if not replicas:
+        sys.exit("No replicas: pass --replica or set DATABASE_REPLICA_URLS.")
+    primary_path = sqlite_path(args.primary)
+    replica_paths = [sqlite_path(url) for url in replicas]
+
+    # Replicas are read-only, so the app can't create the search index on them:
+    # make sure the primary has it before the first copy
+    engine = create_engine(args.primary)
+    ensure_search_index(engine)
+    engine.dispose()
+
+    while True:
+        for replica_path in replica_paths:
+            started = time.perf_counter()
+            copy_database(primary_path, replica_path)
+            print(f"Copied {primary_path} to {replica_path} in {(time.perf_counter() - started) * 1000:.0f} ms",
+                  flush=True)
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, inspect, select
+
+# Fills a database with synthetic customers, categories, products, carts and
+# orders for benchmarking. Create the schema first with database/db_creation.py:
+#     DATABASE_URL=sqlite:///database/bench.db python database/db_creation.py
+#     DATABASE_URL=sqlite:///database/bench.db python database/seed_data.py --products 20000
+#
+# Distributions are skewed the way real stores are: a few categories hold most
+# products, a few products get most of the orders (Zipf), prices are log-normal
+# and most customers order rarely while a few order a lot.
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from analytics import rebuild_sales_summary  # noqa: E402
+from models import (Cart, CartItem, Category, Customer, Order,  # noqa: E402
+                    OrderLine, Product)
+from passwords import hash_password  # noqa: E402
+
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(PROJECT_ROOT, 'database', 'mygrocerystore.db')
+)
+
+# Seeded customers all get this password so benchmarks can log in as any of them
+CUSTOMER_PASSWORD = 'password'
+
+CHUNK_SIZE = 5000
+
+CATEGORY_NAMES = [
+    'Fruits', 'Vegetables', 'Dairy Products', 'Bakery', 'Drinks', 'Snacks', 'Frozen Foods',
+    'Meat', 'Seafood', 'Rice and Grains', 'Pulses', 'Spices', 'Oils', 'Breakfast Cereals',
+    'Household', 'Personal Care', 'Baby Care', 'Pet Food', 'Sweets', 'Condiments',
+]
+ADJECTIVES = [
+    'Fresh', 'Organic', 'Premium', 'Classic', 'Farm', 'Golden', 'Green', 'Natural', 'Crunchy',
+    'Creamy', 'Spicy', 'Sweet', 'Roasted', 'Whole', 'Light', 'Royal', 'Daily', 'Pure',
+]
+NOUNS = [
+    'Apple', 'Banana', 'Mango', 'Tomato', 'Potato', 'Onion', 'Milk', 'Curd', 'Paneer', 'Butter',
+    'Bread', 'Biscuits', 'Juice', 'Tea', 'Coffee', 'Chips', 'Peas', 'Chicken', 'Rice', 'Wheat Flour',
+    'Lentils', 'Turmeric', 'Chilli Powder', 'Sunflower Oil', 'Oats', 'Detergent', 'Soap', 'Shampoo',
+    'Honey', 'Jam', 'Ketchup', 'Noodles', 'Cheese', 'Yogurt', 'Almonds', 'Cashews', 'Sugar', 'Salt',
+]
+PACK_SIZES = ['100 g', '200 g', '250 g', '500 g', '1 kg', '2 kg', '500 ml', '1 L', 'Pack of 6', 'Per Dozen']
+BRANDS = ['A Organics', 'Amul', 'Fresho', 'Daily Farms', 'Nature Pick', 'Green Valley', 'Tata', 'Local Farm']
+
+
+def zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def insert_chunked(connection, model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        connection.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def next_id(connection, column):
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def seed(engine, customers, categories, products, orders, cart_share, days, rng):
+    with engine.begin() as connection:
+        # Customers, each with an (empty) cart
+        first_customer = next_id(connection, Customer.userid)
+        customer_ids = list(range(first_customer, first_customer + customers))
+        # One hash shared by all seeded customers, hashing each one would take minutes
+        password_hash = hash_password(CUSTOMER_PASSWORD)
+        insert_chunked(connection, Customer, [
+            {'userid': customer_id, 'username': f'customer{customer_id}', 'password': password_hash}
+            for customer_id in customer_ids
+        ])
+        existing_carts = set(connection.execute(select(Cart.customer_id)).scalars())
+        first_cart = next_id(connection, Cart.cart_id)
+        cart_rows = [
+            {'cart_id': first_cart + i, 'customer_id': customer_id}
+            for i, customer_id in enumerate(customer_ids) if customer_id not in existing_carts
+        ]
+        insert_chunked(connection, Cart, cart_rows)
+        print(f"{customers} customers")
+
+        # Categories
+        first_category = next_id(connection, Category.category_id)
+        category_ids = list(range(first_category, first_category + categories))
+        insert_chunked(connection, Category, [
+            {'category_id': category_id,
+             'category_name': CATEGORY_NAMES[i % len(CATEGORY_NAMES)] + ('' if i < len(CATEGORY_NAMES) else f' {i}')}
+            for i, category_id in enumerate(category_ids)
+        ])
+        print(f"{categories} categories")
+
+        # Products: category sizes follow a Zipf distribution, prices are log-normal
+        first_product = next_id(connection, Product.product_id)
+        product_ids = list(range(first_product, first_product + products))
+        product_categories = rng.choices(category_ids, weights=zipf_weights(len(category_ids), 0.8), k=products)
+        prices = {}
+        product_rows = []
+        for product_id, category_id in zip(product_ids, product_categories):
+            price = max(5.0, round(rng.lognormvariate(math.log(80), 0.8) * 2) / 2)
+            prices[product_id] = price
+            product_rows.append({
+                'product_id': product_id,
+                'category_id': category_id,
+                'product_name': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} ({rng.choice(PACK_SIZES)})',
+                'product_price': price,
+                'description': f'Manufacturer: {rng.choice(BRANDS)}; Date of Expiry: '
+                               f'{(datetime.now() + timedelta(days=rng.randint(7, 400))):%B %Y}',
+                'image_path': None,
+                'stock_quantity': rng.randint(50, 1000),
+            })
+        insert_chunked(connection, Product, product_rows)
+        print(f"{products} products")
+
+        # Popular products and heavy buyers are drawn far more often
+        popular_products = list(product_ids)
+        rng.shuffle(popular_products)
+        product_weights = zipf_weights(len(popular_products))
+        customer_weights = zipf_weights(len(customer_ids), 0.7)
+
+        def pick_lines(max_lines):
+            count = min(max_lines, 1 + int(rng.expovariate(1 / 2.5)))
+            chosen = set(rng.choices(popular_products, weights=product_weights, k=count))
+            return [(product_id, rng.choices((1, 2, 3, 4, 6), weights=(60, 20, 10, 6, 4))[0]) for product_id in chosen]
+
+        # Active carts for a share of the customers
+        cart_ids = dict(connection.execute(select(Cart.customer_id, Cart.cart_id)).all())
+        cart_item_rows = []
+        for customer_id in rng.sample(customer_ids, int(len(customer_ids) * cart_share)):
+            for product_id, quantity in pick_lines(6):
+                cart_item_rows.append({'cart_id': cart_ids[customer_id], 'product_id': product_id,
+                                       'quantity': quantity, 'price': prices[product_id]})
+        insert_chunked(connection, CartItem, cart_item_rows)
+        print(f"{len(cart_item_rows)} cart items")
+
+        # Order history spread over the last `days` days, busier on weekends
+        first_order = next_id(connection, Order.order_id)
+        now = datetime.utcnow()
+        order_rows, line_rows = [], []
+        order_customers = rng.choices(customer_ids, weights=customer_weights, k=orders)
+        for order_id, customer_id in enumerate(order_customers, start=first_order):
+            created_at = now - timedelta(days=rng.uniform(0, days))
+            if created_at.weekday() < 5 and rng.random() < 0.25:
+                created_at += timedelta(days=5 - created_at.weekday())
+            order_rows.append({'order_id': order_id, 'customer_id': customer_id,
+                               'address': f'{rng.randint(1, 999)} Main Road', 'phone_number': f'9{rng.randint(0, 10**9 - 1):09d}',
+                               'created_at': min(created_at, now)})
+            for product_id, quantity in pick_lines(8):
+                line_rows.append({'order_id': order_id, 'product_id': product_id,
+                                  'quantity': quantity, 'unit_price': prices[product_id]})
+        insert_chunked(connection, Order, order_rows)
+        insert_chunked(connection, OrderLine, line_rows)
+        print(f"{orders} orders with {len(line_rows)} order lines")
+
+        # The orders were written directly, so recompute the admin sales summary from them
+        print(f"{rebuild_sales_summary(connection)} sales summary rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the database with synthetic store data.")
+    parser.add_argument('--customers', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--cart-share', type=float, default=0.3, help="share of customers with items in their cart")
+    parser.add_argument('--days', type=int, default=365, help="spread orders over this many past days")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(DATABASE_URL)
+    if 'products' not in inspect(engine).get_table_names():
+        sys.exit("No tables found. Run database/db_creation.py first.")
+
+    seed(engine, args.customers, args.categories, args.products, args.orders,
+         args.cart_share, args.days, random.Random(args.seed))
+    print("Synthetic data created successfully.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import os
+import random
+import re
+import threading
+import time
+
+from flask import (current_app, g, has_app_context, has_request_context,
+                   request, session)
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, scoped_session
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+
+# Engine and session setup shared by the app and the scripts in database/
+#
+# The app's engine is created the first time get_engine() is called in a
+# process, not when the app is created: importing main or calling create_app()
+# opens no connection, and a worker forked from a preloaded app builds its own
+# pool instead of sharing the parent's sockets/file handles. Code that needs the
+# engine itself (event listeners, the FTS setup) registers a hook with
+# on_engine_created(), which runs once for every engine before it is used.
+#
+# With DATABASE_REPLICA_URLS set, DBSession() returns a RoutingSession: in the
+# views marked @replica_reads (GET requests only) it sends reads to one of the
+# replicas, picked once per request, and everything else goes to the primary.
+# Writes always go to the primary, and a visitor who just wrote something reads
+# from the primary for REPLICA_LAG_SECONDS afterwards (read-your-writes), so they
+# never see a replica that hasn't caught up with their own change yet.
+
+# Names of the view functions whose reads may go to a replica
+REPLICA_VIEWS = set()
+
+# An EXPLAIN QUERY PLAN line that reads a whole table rather than searching an
+# index, e.g. 'SCAN orders' (but not 'SCAN orders USING INDEX ...' or a MATCH
+# on an FTS5 table, 'SCAN products_fts VIRTUAL TABLE INDEX ...')
+FULL_SCAN = re.compile(r'^SCAN (\w+)\b(?! USING| VIRTUAL TABLE)')
+
+
+def create_db_engine(url, pool_size=5, max_overflow=10, pool_timeout=30, busy_timeout_ms=5000, read_only=False):
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite':
+        return create_engine(url, pool_size=pool_size, max_overflow=max_overflow,
+                             pool_timeout=pool_timeout, pool_pre_ping=True)
+
+    if url.database in (None, '', ':memory:'):
+        # In-memory databases live and die with a single connection, so keep the defaults
+        return create_engine(url)
+
+    # File based SQLite: keep a sized pool of connections that can be shared between
+    # threads (SQLAlchemy's default for SQLite files is to reconnect every checkout)
+    engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        connect_args={'check_same_thread': False, 'timeout': busy_timeout_ms / 1000},
+    )
+
+    set_sqlite_pragmas(engine, busy_timeout_ms, read_only)
+    return engine
+
+
+def set_sqlite_pragmas(engine, busy_timeout_ms, read_only=False):
+    # Also used for the async API engine (pass its .sync_engine)
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers keep reading while a writer commits, busy_timeout makes a
+        # second writer wait for the lock instead of failing with "database is locked"
+        # and synchronous=NORMAL is durable enough in WAL mode while skipping an fsync
+        # on every commit
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        if read_only:
+            # Replicas: anything that would write fails instead of diverging from the primary
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+
+
+def _scope_id():
+    # One session per Flask app context (i.e. per request), per thread outside of one
+    if has_app_context():
+        return id(g._get_current_object())
+    return threading.get_ident()
+
+
+def _create_app_engine(app, url, read_only=False):
+    return create_db_engine(
+        url,
+        pool_size=app.config['DB_POOL_SIZE'],
+        max_overflow=app.config['DB_MAX_OVERFLOW'],
+        busy_timeout_ms=app.config['DB_BUSY_TIMEOUT_MS'],
+        read_only=read_only
+    )
+
+
+def _engines(app):
+    # (primary, replicas) of app, created on first use in this process
+    state = app.extensions['db']
+    if state['pid'] != os.getpid():
+        with state['lock']:
+            if state['pid'] != os.getpid():
+                for engine in [state['engine'], *state['replicas']]:
+                    if engine is not None:
+                        # Forked from a process that already used the engine: leave its
+                        # connections to the parent rather than closing them from here
+                        engine.dispose(close=False)
+                engine = _create_app_engine(app, app.config['DATABASE_URL'])
+                replicas = [_create_app_engine(app, url, read_only=True)
+                            for url in app.config.get('DATABASE_REPLICA_URLS') or []]
+                for hook, on_replicas in state['on_engine_created']:
+                    for each in [engine, *replicas] if on_replicas else [engine]:
+                        hook(each)
+                state['engine'], state['replicas'], state['pid'] = engine, replicas, os.getpid()
+    return state['engine'], state['replicas']
+
+
+def get_engine(app=None):
+    # The primary engine of app (default: the current app)
+    return _engines(app or current_app._get_current_object())[0]
+
+
+def get_replica_engines(app=None):
+    return _engines(app or current_app._get_current_object())[1]
+
+
+def on_engine_created(app, hook, replicas=True):
+    # hook(engine) runs when the app creates its engines, in the order registered;
+    # with replicas=False only for the primary
+    app.extensions['db']['on_engine_created'].append((hook, replicas))
+
+
+def replica_reads(view):
+    # Decorator for read-only view functions whose queries may be answered by a
+    # replica; put it below @bp.route
+    REPLICA_VIEWS.add(view.__name__)
+    return view
+
+
+def pin_to_primary():
+    # Sends the rest of the current request's reads to the primary, including
+    # those of a session that was already reading from a replica
+    g.pinned_to_primary = True
+    if DBSession.registry.has():
+        DBSession().replica = None
+
+
+def _reads_from_replica():
+    if not has_request_context() or request.method not in ('GET', 'HEAD') or g.get('pinned_to_primary'):
+        return False
+    if (request.endpoint or '').rpartition('.')[2] not in REPLICA_VIEWS:
+        return False
+    # Read-your-writes: set after this visitor's last write, see init_app
+    return session.get('db_pinned_until', 0) < time.time()
+
+
+class RoutingSession(Session):
+    # Bound to the primary; reads go to replica instead when one is given.
+    # wrote is set once a write has been sent to the primary.
+    def __init__(self, replica=None, **kwargs):
+        super().__init__(**kwargs)
+        self.replica = replica
+        self.wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.wrote = True
+            return super().get_bind(mapper, clause, **kwargs)
+        if self.replica is not None:
+            return self.replica
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+def _create_session():
+    engine, replicas = _engines(current_app._get_current_object())
+    replica = random.choice(replicas) if replicas and _reads_from_replica() else None
+    return RoutingSession(bind=engine, replica=replica)
+
+
+# DBSession() returns the session of the current request, bound to the current
+# app's engine; it is closed automatically when the request's app context is
+# torn down, so routes never close it by hand
+DBSession = scoped_session(_create_session, scopefunc=_scope_id)
+
+
+def init_app(app):
+    app.extensions['db'] = {'engine': None, 'replicas': [], 'pid': None, 'on_engine_created': [],
+                            'lock': threading.Lock()}
+
+    @app.after_request
+    def pin_writer_to_primary(response):
+        # After a visitor's own write their reads go to the primary until the
+        # replicas have had time to catch up
+        if app.config.get('DATABASE_REPLICA_URLS') and DBSession.registry.has() and DBSession().wrote:
+            session['db_pinned_until'] = time.time() + app.config['REPLICA_LAG_SECONDS']
+        return response
+
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        # Rolls back anything left uncommitted and returns the connection to the pool
+        DBSession.remove()
+
+
+def explain_query_plan(dbapi_connection, sql, parameters=()):
+    # Returns the detail lines of SQLite's EXPLAIN QUERY PLAN for a statement,
+    # e.g. ['SEARCH products USING INDEX ix_products_category_id (category_id=?)']
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
@@ -0,0 +1,57 @@
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+from catalog_cache import CatalogCache
+
+# Cached HTML fragments for the storefront's product grids and category list.
+#
+# A product tile only changes when the product does, and every admin change to
+# the catalog bumps the catalog version, so rendered tiles are cached per
+# product id in a CatalogCache that shares the catalog's version store: a bump
+# empties it like the data cache. The grids then call product_tiles(products),
+# which joins the cached strings and renders only the tiles it hasn't seen yet.
+#
+# Templates are also compiled to a FileSystemBytecodeCache, so a freshly forked
+# worker loads compiled templates from disk instead of parsing them again.
+
+PRODUCT_TILE_TEMPLATE = '_product_tile.html'
+CATEGORY_LIST_TEMPLATE = '_category_list.html'
+
+
+def _product_id(product):
+    # Catalog pages pass the cached dicts, search passes Product rows
+    return product['product_id'] if isinstance(product, dict) else product.product_id
+
+
+def init_app(app, catalog_cache):
+    if app.config.get('JINJA_BYTECODE_CACHE', True):
+        # None lets Jinja use a per-user directory under the system temp dir
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config.get('JINJA_BYTECODE_CACHE_DIR'))
+
+    fragment_cache = CatalogCache(
+        catalog_cache.version_store,
+        max_entries=app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000),
+        ttl=app.config.get('FRAGMENT_CACHE_TTL', 300)
+    )
+
+    def render(template_name, **context):
+        # Straight from the Jinja environment: no context processors or render
+        # signals, the fragment is part of the page that includes it
+        return Markup(current_app.jinja_env.get_template(template_name).render(**context))
+
+    @app.template_global()
+    def product_tiles(products):
+        return Markup(''.join(
+            fragment_cache.get_or_load(('product_tile', _product_id(product)),
+                                       lambda product=product: render(PRODUCT_TILE_TEMPLATE, product=product))
+            for product in products
+        ))
+
+    @app.template_global()
+    def category_list(categories):
+        # Only used with the full category list, so one entry per catalog version
+        return fragment_cache.get_or_load('category_list',
+                                          lambda: render(CATEGORY_LIST_TEMPLATE, categories=categories))
+
+    return fragment_cache
@@ -0,0 +1,108 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import request, url_for
+
+# Product image pipeline.
+#
+# Uploads are stored under a content-hashed name (<sha256 prefix>.<ext>), so a
+# given URL always refers to the same bytes and can be cached forever. Resized
+# copies in WebP and JPEG are generated by a background job (see jobs.py) after
+# the request has returned, and their file names are recorded in
+# Product.image_variants as {"webp": {"320": "<hash>-320.webp", ...}, "jpeg": {...}}.
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+# Matches the names produced by save_upload() and generate_variants()
+HASHED_NAME = re.compile(r'^uploads/[0-9a-f]{16}(-\d+)?\.[a-z]+$')
+
+
+def save_upload(file_storage, upload_folder):
+    # Streams the upload to disk while hashing it and returns the stored file name
+    extension = file_storage.filename.rsplit('.', 1)[1].lower()
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            for chunk in iter(lambda: file_storage.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                tmp_file.write(chunk)
+        filename = f'{digest.hexdigest()[:16]}.{extension}'
+        os.replace(tmp_path, os.path.join(upload_folder, filename))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filename
+
+
+def generate_variants(upload_folder, filename):
+    # Pillow is imported here rather than with the app: only the image job needs it
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:  # Pillow not installed: uploads are stored but not resized
+        return {}
+
+    stem = filename.rsplit('.', 1)[0]
+    variants = {'webp': {}, 'jpeg': {}}
+    with Image.open(os.path.join(upload_folder, filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        # Never upscale: widths larger than the original collapse to the original width
+        widths = sorted({min(width, image.width) for width in THUMBNAIL_WIDTHS})
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+
+            webp_name = f'{stem}-{width}.webp'
+            resized.save(os.path.join(upload_folder, webp_name), 'WEBP', quality=WEBP_QUALITY, method=6)
+            variants['webp'][str(width)] = webp_name
+
+            jpeg_name = f'{stem}-{width}.jpg'
+            resized.convert('RGB').save(os.path.join(upload_folder, jpeg_name), 'JPEG',
+                                        quality=JPEG_QUALITY, optimize=True, progressive=True)
+            variants['jpeg'][str(width)] = jpeg_name
+    return variants
+
+
+def variant_files(upload_folder, filename):
+    # Names of the resized copies of filename on disk, found by their common stem
+    # (generate_variants() writes <stem>-<width>.webp and <stem>-<width>.jpg)
+    variant_name = re.compile(rf'^{re.escape(filename.rsplit(".", 1)[0])}-\d+\.(webp|jpg)$')
+    with os.scandir(upload_folder) as entries:
+        return [entry.name for entry in entries if variant_name.match(entry.name)]
+
+
+def delete_image_files(upload_folder, filename):
+    # Deletes an upload and every resized copy of it, including copies written
+    # after the product stopped using it
+    for name in [filename, *variant_files(upload_folder, filename)]:
+        path = os.path.join(upload_folder, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def srcset(files):
+    # {"160": "a-160.webp", "320": "a-320.webp"} -> "/static/uploads/a-160.webp 160w, ..."
+    return ', '.join(
+        f"{url_for('static', filename='uploads/' + name)} {width}w"
+        for width, name in sorted(files.items(), key=lambda item: int(item[0]))
+    )
+
+
+def init_app(app):
+    app.add_template_filter(srcset)
+
+    @app.after_request
+    def cache_hashed_uploads(response):
+        # Content-hashed files never change, so browsers may keep them for a year
+        filename = (request.view_args or {}).get('filename', '')
+        if request.endpoint == 'static' and response.status_code == 200 and HASHED_NAME.match(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,139 @@
+import hmac
+import os
+import time
+
+from flask import (Response, before_render_template, g, has_request_context,
+                   redirect, request, session, template_rendered)
+from flask.signals import signals_available
+from sqlalchemy import event
+
+from db import on_engine_created
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry,
+                                   Histogram, generate_latest, multiprocess)
+except ImportError:  # prometheus_client not installed: Server-Timing only, no /admin/metrics
+    Histogram = None
+
+# Per-request timing.
+#
+# Every request records its SQL statement count and time (cursor execute hooks),
+# template render time (Flask's template signals) and total latency. The numbers
+# are sent back in a Server-Timing header, visible in the browser's network tab:
+#     Server-Timing: sql;dur=3.1;desc="queries=4", tpl;dur=1.2, total;dur=6.0
+# and aggregated per endpoint into Prometheus histograms served at /admin/metrics.
+#
+# With several worker processes (gunicorn -w N) set PROMETHEUS_MULTIPROC_DIR to an
+# empty directory so the metrics page adds up the samples of all workers.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+registry = CollectorRegistry() if Histogram else None
+metrics = {}
+if Histogram:
+    metrics = {
+        'latency': Histogram('http_request_duration_seconds', "Total request latency",
+                             ['endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS, registry=registry),
+        'sql_time': Histogram('http_request_sql_seconds', "Time spent in SQL per request",
+                              ['endpoint'], buckets=LATENCY_BUCKETS, registry=registry),
+        'sql_queries': Histogram('http_request_sql_queries', "SQL statements per request",
+                                 ['endpoint'], buckets=QUERY_COUNT_BUCKETS, registry=registry),
+        'template_time': Histogram('http_request_template_seconds', "Template render time per request",
+                                   ['endpoint'], buckets=LATENCY_BUCKETS, registry=registry),
+    }
+
+
+# The start time is kept on the statement's execution context, not the connection:
+# a statement that raises never reaches after_cursor_execute, and would leave it
+# behind on the pooled connection. (context is None only for the dialect's own
+# column-default executions, which aren't timed.)
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if has_request_context():
+        g.sql_time = g.get('sql_time', 0.0) + elapsed
+        g.sql_queries = g.get('sql_queries', 0) + 1
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('template_start', []).append(time.perf_counter())
+
+
+def _template_rendered(sender, template, context, **extra):
+    starts = g.get('template_start')
+    if starts:
+        elapsed = time.perf_counter() - starts.pop()
+        # A template rendered from inside another one is already part of the outer time
+        if not starts:
+            g.template_time = g.get('template_time', 0.0) + elapsed
+
+
+def server_timing(sql_time, sql_queries, template_time, total):
+    return (f'sql;dur={sql_time * 1000:.1f};desc="queries={sql_queries}", '
+            f'tpl;dur={template_time * 1000:.1f}, total;dur={total * 1000:.1f}')
+
+
+def _metrics_allowed(app):
+    if 'admin_id' in session:
+        return True
+    # Lets a Prometheus scraper in with "Authorization: Bearer <METRICS_TOKEN>"
+    token = app.config.get('METRICS_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+
+def _listen(engine):
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_app(app):
+    on_engine_created(app, _listen)
+    if signals_available:  # Needs blinker; without it template time is reported as 0
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_timings(response):
+        if 'request_start' not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        sql_time, sql_queries = g.get('sql_time', 0.0), g.get('sql_queries', 0)
+        template_time = g.get('template_time', 0.0)
+
+        if app.config.get('SERVER_TIMING_ENABLED', True):
+            response.headers['Server-Timing'] = server_timing(sql_time, sql_queries, template_time, total)
+
+        if metrics and request.endpoint != 'metrics':
+            endpoint = request.endpoint or 'unknown'
+            metrics['latency'].labels(endpoint, request.method, str(response.status_code)).observe(total)
+            metrics['sql_time'].labels(endpoint).observe(sql_time)
+            metrics['sql_queries'].labels(endpoint).observe(sql_queries)
+            metrics['template_time'].labels(endpoint).observe(template_time)
+        return response
+
+    @app.route('/admin/metrics', endpoint='metrics')
+    def metrics_page():
+        if not _metrics_allowed(app):
+            return redirect('/admin')  # Redirect to admin login if not logged in
+        if not metrics:
+            return Response("prometheus_client is not installed\n", status=501, mimetype='text/plain')
+
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            collected = CollectorRegistry()
+            multiprocess.MultiProcessCollector(collected)
+        else:
+            collected = registry
+        return Response(generate_latest(collected), headers={'Content-Type': CONTENT_TYPE_LATEST})
@@ -0,0 +1,48 @@
+from sqlalchemy import bindparam, case
+
+from models import Product
+
+# Stock reservation at checkout.
+#
+# Stock is taken with one conditional UPDATE per order line:
+#     UPDATE products SET stock_quantity = stock_quantity - :quantity
+#     WHERE product_id = :product_id AND stock_quantity >= :quantity
+# all sent as a single executemany inside the checkout transaction. The check
+# and the decrement are one statement, so two checkouts racing for the last
+# units can never both pass a check made on a stale read, and no lock is held
+# beyond the transaction that writes the order. If a line matches no row (too
+# little stock, or the product is gone) the caller rolls the whole order back.
+#
+# Lines are updated in product_id order: on a database with row locks two
+# checkouts sharing products then lock them in the same order and can't deadlock.
+
+_products = Product.__table__
+
+RESERVE_STMT = (
+    _products.update()
+    .where(_products.c.product_id == bindparam('line_product_id'),
+           _products.c.stock_quantity >= bindparam('line_quantity'))
+    .values(stock_quantity=_products.c.stock_quantity - bindparam('line_quantity'))
+)
+
+
+def reserve_stock(db_session, lines):
+    # lines: (product_id, quantity). Returns False if any line couldn't be
+    # reserved, in which case the caller must roll back. The caller commits.
+    lines = sorted(lines)
+    if not lines:
+        return True
+    result = db_session.execute(RESERVE_STMT, [
+        {'line_product_id': product_id, 'line_quantity': quantity} for product_id, quantity in lines
+    ])
+    return result.rowcount == len(lines)
+
+
+def adjust_stock(db_session, product_id, delta):
+    # Adds delta (may be negative, stopping at 0) to the stock as a relative UPDATE,
+    # so an admin restocking a product doesn't overwrite units sold since the form
+    # was loaded. The caller commits.
+    new_quantity = Product.stock_quantity + delta
+    db_session.query(Product).filter_by(product_id=product_id).update(
+        {'stock_quantity': case((new_quantity < 0, 0), else_=new_quantity)}, synchronize_session=False
+    )
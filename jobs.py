@@ -0,0 +1,215 @@
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.sqlite import insert
+
+from db import get_engine
+from models import Job
+
+# Durable background jobs, stored in the jobs table of the app's database.
+#
+# A request only inserts a row, in the same transaction as the change that
+# needs the work, so a job is queued if and only if that change is committed:
+#     jobs.enqueue(db_session, 'build_image_variants', {'product_id': 3, 'image_path': 'ab12.png'})
+#     db_session.commit()
+# Workers (`flask run-worker`, or JOB_WORKER_THREADS threads inside each web
+# process) claim the oldest ready job with one conditional UPDATE, so any number
+# of threads and processes can share the queue without running a job twice. A
+# job that raises is retried with exponential backoff and jitter until it has
+# had max_attempts tries, then left as 'failed' with its last error. A job whose
+# worker died while running it is claimed again after JOB_LOCK_TIMEOUT_SECONDS.
+#
+# Tasks must be safe to run more than once: a worker can die after the work but
+# before marking the job done.
+
+logger = logging.getLogger(__name__)
+
+# Maps task name -> function, filled by @task
+TASKS = {}
+
+_jobs = Job.__table__
+UNFINISHED = ('queued', 'running')
+
+
+def task(func):
+    # Decorator for functions jobs can run, by function name. Tasks run inside an
+    # app context and take the job's payload as keyword arguments.
+    TASKS[func.__name__] = func
+    return func
+
+
+def enqueue(db_session, name, payload=None, idempotency_key=None, delay=0, max_attempts=5):
+    # Queues a job in the caller's transaction; the caller commits. While a job
+    # with the same idempotency_key is queued or running this does nothing.
+    stmt = insert(Job).values(
+        name=name,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        created_at=datetime.utcnow()
+    )
+    if idempotency_key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['idempotency_key'],
+                                           index_where=_jobs.c.status.in_(UNFINISHED))
+    db_session.execute(stmt)
+
+
+def retry_delay(attempts, base_seconds, max_seconds):
+    # base, 2 x base, 4 x base ... capped at max_seconds, each scaled by a random
+    # 0.5-1 so jobs that failed together don't all come back at the same moment
+    return min(base_seconds * 2 ** (attempts - 1), max_seconds) * random.uniform(0.5, 1)
+
+
+def ready_jobs(lock_timeout, now=None):
+    # The ids of the jobs due to run, oldest first: queued ones whose run_at has
+    # passed and running ones whose worker has held them for too long
+    now = now or datetime.utcnow()
+    return select(_jobs.c.id).where(or_(
+        and_(_jobs.c.status == 'queued', _jobs.c.run_at <= now),
+        and_(_jobs.c.status == 'running', _jobs.c.locked_at < now - timedelta(seconds=lock_timeout))
+    )).order_by(_jobs.c.run_at, _jobs.c.id)
+
+
+def claim_job(engine, worker_name, lock_timeout):
+    # Marks the oldest ready job as running for this worker and returns it, or
+    # None. A single UPDATE picks and locks it, so two workers never get the same job.
+    now = datetime.utcnow()
+    token = f'{worker_name}:{uuid.uuid4().hex}'
+    candidate = ready_jobs(lock_timeout, now).limit(1).scalar_subquery()
+
+    with engine.begin() as conn:
+        claimed = conn.execute(
+            _jobs.update().where(_jobs.c.id == candidate)
+            .values(status='running', locked_by=token, locked_at=now, attempts=_jobs.c.attempts + 1)
+        ).rowcount
+        if not claimed:
+            return None
+        return conn.execute(select(_jobs).where(_jobs.c.locked_by == token)).first()
+
+
+def _finish(engine, job, **values):
+    # Only if the job is still ours: after a lock timeout another worker may own it
+    with engine.begin() as conn:
+        conn.execute(_jobs.update().where(_jobs.c.id == job.id, _jobs.c.locked_by == job.locked_by)
+                     .values(locked_by=None, locked_at=None, **values))
+
+
+def run_job(app, job):
+    engine = get_engine(app)
+    try:
+        task_func = TASKS.get(job.name)
+        if task_func is None:
+            raise LookupError(f"no task named {job.name!r}")
+        with app.app_context():
+            task_func(**(job.payload or {}))
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.name, job.attempts)
+        error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            _finish(engine, job, status='failed', last_error=error, finished_at=datetime.utcnow())
+        else:
+            delay = retry_delay(job.attempts, app.config['JOB_RETRY_BASE_SECONDS'],
+                                app.config['JOB_RETRY_MAX_SECONDS'])
+            _finish(engine, job, status='queued', last_error=error,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay))
+        return False
+    _finish(engine, job, status='done', finished_at=datetime.utcnow())
+    return True
+
+
+def work(app, worker_name, stop, poll_interval=1.0, burst=False):
+    # Runs jobs until stop is set (or, with burst, until none is ready)
+    engine = get_engine(app)
+    while not stop.is_set():
+        try:
+            job = claim_job(engine, worker_name, app.config['JOB_LOCK_TIMEOUT_SECONDS'])
+            if job is not None:
+                run_job(app, job)
+                continue
+        except Exception:
+            # e.g. the database stayed locked for longer than the busy timeout;
+            # a claimed job is picked up again after the lock timeout
+            logger.exception("Job worker error")
+        if burst:
+            return
+        stop.wait(poll_interval)
+
+
+def start_workers(app, threads, poll_interval=1.0, burst=False, daemon=False):
+    # Starts worker threads and returns (threads, stop event)
+    stop = threading.Event()
+    workers = [
+        threading.Thread(target=work, args=(app, f'{os.getpid()}-{i}', stop, poll_interval, burst),
+                         name=f'jobs-{i}', daemon=daemon)
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers, stop
+
+
+def _run_process(app, threads, burst):
+    workers, stop = start_workers(app, threads, app.config['JOB_POLL_INTERVAL'], burst)
+    try:
+        for worker in workers:
+            # join in short steps so Ctrl+C is noticed
+            while worker.is_alive():
+                worker.join(0.5)
+    except KeyboardInterrupt:
+        # Let the jobs that are running finish
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def run_workers(app, threads, processes=1, burst=False):
+    # Runs worker threads in this process, or in forked processes (each creates
+    # its own database engine, see db.py), until interrupted or, with burst,
+    # until no job is ready
+    if processes <= 1:
+        _run_process(app, threads, burst)
+        return
+    context = multiprocessing.get_context('fork')
+    children = [context.Process(target=_run_process, args=(app, threads, burst)) for _ in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        # The children got the same Ctrl+C and are finishing their jobs
+        for child in children:
+            child.join()
+
+
+def count_jobs(app):
+    # {status: number of jobs}
+    with get_engine(app).connect() as conn:
+        return dict(conn.execute(select(_jobs.c.status, func.count()).group_by(_jobs.c.status)).all())
+
+
+def init_app(app):
+    app.extensions['jobs'] = {'pid': None, 'lock': threading.Lock()}
+    if not app.config.get('JOB_WORKER_THREADS'):
+        return
+
+    @app.before_request
+    def start_app_workers():
+        # Worker threads inside the web process, started once per process by its
+        # first request (so a forked worker starts its own)
+        state = app.extensions['jobs']
+        if state['pid'] != os.getpid():
+            with state['lock']:
+                if state['pid'] != os.getpid():
+                    start_workers(app, app.config['JOB_WORKER_THREADS'],
+                                  app.config['JOB_POLL_INTERVAL'], daemon=True)
+                    state['pid'] = os.getpid()
@@ -1,50 +1,175 @@
 
 import os
+import time
 from datetime import datetime
 
 # Inside your view function
 current_year = datetime.now().year
 
-from flask import (Flask, flash, jsonify, redirect, render_template, request,
-                   session, url_for)
-from sqlalchemy import create_engine, or_
-from sqlalchemy.orm import joinedload, sessionmaker
-from werkzeug.utils import secure_filename
+import click
+from flask import (Blueprint, Flask, Response, current_app, flash, jsonify,
+                   redirect, render_template, request, session,
+                   stream_with_context, url_for)
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.local import LocalProxy
+
+import analytics
+import db
+import fragments
+import images
+import instrumentation
+import jobs
+import passwords
+import query_budgets
+import slow_queries
+import static_assets
+from carts import (add_product_to_cart, add_to_guest_cart, get_guest_cart_items,
+                   merge_guest_cart, set_guest_cart_quantity)
+from catalog_cache import create_catalog_cache
+from catalog_import import (FORMATS, default_sku, detect_format, export_catalog,
+                            import_catalog)
+from conditional import catalog_conditional
+from config import CONFIGS
+from db import DBSession, replica_reads
+from images import delete_image_files, generate_variants, save_upload
+from inventory import adjust_stock, reserve_stock
+from models import (Admin, Cart, CartItem, Category, Customer, Order,
+                    OrderLine, Product)
+from pagination import get_page_args, keyset_page
+from passwords import VerifierBusy, hash_password, verify_password
+from query_budgets import query_budget
+from search_index import ensure_search_index, search_products
+from serializers import (category_to_dict, json_array_chunks, ndjson_chunks,
+                         product_to_dict)
 
-from models import (Admin, Base, Cart, CartItem, Category, Customer, Order,
-                    Product)
-
-# Define a directory for storing product images
-UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif'}  # Define allowed image file extensions
 
-# Create an instance of the Flask app and configure the image upload settings
+current_year = datetime.now().year
 
-app = Flask(__name__)
-app.secret_key = 'Secret_Key'  # Replace with a strong secret key
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limit file size to 16MB
+# Every route and command of the store; create_app() registers it on the app
+bp = Blueprint('store', __name__, cli_group=None)
 
-current_year = datetime.now().year
+# The caches of the app handling the current request (see create_app). Admin
+# routes that change products or categories call catalog_cache.bump() after committing.
+catalog_cache = LocalProxy(lambda: current_app.extensions['catalog_cache'])
+fragment_cache = LocalProxy(lambda: current_app.extensions['fragment_cache'])
+
+
+def create_app(config=None):
+    # config: a profile name from config.CONFIGS, or a dict of settings applied on
+    # top of the APP_CONFIG profile. Nothing here touches the database: the engine
+    # and everything hooked to it are set up by the first request that uses it.
+    app = Flask(__name__)
+    profile = config if isinstance(config, str) else os.environ.get('APP_CONFIG', 'development')
+    app.config.from_object(CONFIGS[profile])
+    if isinstance(config, dict):
+        app.config.update(config)
+
+    # Hash and verify passwords on a bounded thread pool
+    passwords.init_app(app)
+
+    # Serve content-hashed uploads with far-future caching and register the srcset filter
+    images.init_app(app)
+
+    # Fingerprinted, precompressed static files and gzip for large HTML/JSON responses
+    static_assets.init_app(app)
+
+    # Lazily created engines and the DBSession teardown; reads of the catalog views
+    # go to DATABASE_REPLICA_URLS when set
+    db.init_app(app)
+
+    # Create/refresh the FTS5 search index (falls back to LIKE search if FTS5 is
+    # missing). Registered first, so its DDL isn't counted against a request's budget.
+    app.config['SEARCH_FTS_ENABLED'] = False
+    db.on_engine_created(app, lambda engine: app.config.update(SEARCH_FTS_ENABLED=ensure_search_index(engine)),
+                         replicas=False)
+
+    # Count SQL statements per request and check them against each route's budget
+    query_budgets.init_app(app)
+
+    # SQL/template/total time per request: Server-Timing header and /admin/metrics
+    instrumentation.init_app(app)
+
+    # Log slow statements and full table scans with EXPLAIN QUERY PLAN to SLOW_QUERY_LOG
+    slow_queries.init_app(app)
+
+    # Background job queue; in-process worker threads unless JOB_WORKER_THREADS is 0
+    jobs.init_app(app)
+
+    # Cache for storefront catalog reads
+    if not app.config['JOB_WORKER_THREADS'] and not app.config['CATALOG_VERSION_FILE'] and not app.testing:
+        app.logger.warning("JOB_WORKER_THREADS is 0 but CATALOG_VERSION_FILE is not set: catalog changes "
+                           "made by `flask run-worker` jobs won't reach this process's cached pages")
+    app.extensions['catalog_cache'] = create_catalog_cache(
+        app.config['CATALOG_VERSION_FILE'],
+        max_entries=app.config['CATALOG_CACHE_MAX_ENTRIES'],
+        ttl=app.config['CATALOG_CACHE_TTL']
+    )
+
+    # Rendered product tiles and category list, cached per catalog version, and the
+    # template bytecode cache
+    app.extensions['fragment_cache'] = fragments.init_app(app, app.extensions['catalog_cache'])
+
+    app.register_blueprint(bp)
+    return app
+
+
+# Until the replicas have caught up with an admin's change to the catalog, catalog
+# pages are read from the primary: a page loaded from a replica now would be cached
+# under the new catalog version with the old data, for the cache's whole TTL
+@bp.before_request
+def read_recent_catalog_changes_from_primary():
+    if current_app.config['DATABASE_REPLICA_URLS']:
+        updated_at = catalog_cache.version_store.get()[1]
+        if time.time() - updated_at < current_app.config['REPLICA_LAG_SECONDS']:
+            db.pin_to_primary()
+
+
+# Cached catalog reads shared by the storefront pages and the JSON API
+def get_product_page(after, per_page):
+    def load():
+        products, next_cursor = keyset_page(DBSession(), select(Product), Product.product_id, after, per_page)
+        return [product_to_dict(product) for product in products], next_cursor
+
+    return catalog_cache.get_or_load(('products', after, per_page), load)
 
-# Database setup
-DATABASE_URL = 'sqlite:///database/mygrocerystore.db'
-engine = create_engine(DATABASE_URL)
-Base.metadata.bind = engine
-DBSession = sessionmaker(bind=engine)
 
-@app.route('/')
+def get_categories():
+    def load():
+        return [category_to_dict(category) for category in DBSession().query(Category).all()]
+
+    return catalog_cache.get_or_load('categories', load)
+
+
+def get_category_products(category_id):
+    def load():
+        db_session = DBSession()
+        category = db_session.query(Category).filter_by(category_id=category_id).first()
+        if not category:
+            return None, []
+        products = db_session.query(Product).filter_by(category_id=category_id).all()
+        return category_to_dict(category), [product_to_dict(product) for product in products]
+
+    return catalog_cache.get_or_load(('category', category_id), load)
+
+
+@bp.route('/')
+@query_budget(1)
+@replica_reads
 def index():
-    # Query the products from the database
-    db_session = DBSession()
-    products = db_session.query(Product).all()
-    db_session.close()
+    after, per_page = get_page_args(current_app.config['PRODUCTS_PER_PAGE'], current_app.config['MAX_PRODUCTS_PER_PAGE'])
+
+    # Get one page of products (from the cache when possible)
+    products, next_cursor = get_product_page(after, per_page)
     
     # Render the 'index.html' template and pass the products
-    return render_template('index.html', products=products)
+    return render_template('index.html', products=products, after=after,
+                           next_cursor=next_cursor, per_page=per_page)
 
 
-@app.route('/admin_home')
+@bp.route('/admin_home')
 def admin_home():
     # Check if the admin is logged in
     if 'admin_id' in session:
@@ -54,7 +179,7 @@ def admin_home():
 
 # Registration and Login routes for Customers
 # Registration and Login routes for Customers
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def customer_register():
     if request.method == 'POST':
         username = request.form['username']
@@ -64,31 +189,65 @@ def customer_register():
         db_session = DBSession()
         existing_customer = db_session.query(Customer).filter_by(username=username).first()
         if existing_customer:
-            db_session.close()
             return "Username already exists. Please choose a different one."
 
-        # Create a new customer
-        new_customer = Customer(username=username, password=password)
+        # Create a new customer along with their (empty) cart
+        new_customer = Customer(username=username, password=hash_password(password))
         db_session.add(new_customer)
+        db_session.flush()  # Assigns new_customer.userid
+        db_session.add(Cart(customer_id=new_customer.userid))
         db_session.commit()
-        db_session.close()
         return redirect('/login')
 
     return render_template('customer_register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+# Returned when too many logins are already waiting for their password to be checked
+LOGIN_BUSY_RESPONSE = ("Too many login attempts right now. Please try again in a moment.", 503, {'Retry-After': '1'})
+
+
+# Checks a username and password against the customers or admins table and returns
+# the account id, or None. Legacy plaintext passwords are replaced by a hash.
+def authenticate(id_column, password_column, username, password):
+    db_session = DBSession()
+    account = db_session.query(id_column, password_column).filter(
+        id_column.class_.username == username
+    ).first()
+    # End the read transaction so no pooled connection is held while hashing
+    db_session.commit()
+
+    matches, new_hash = verify_password(account[1] if account else None, password,
+                                        current_app.config['PASSWORD_VERIFY_TIMEOUT'])
+    if not matches:
+        return None
+    if new_hash:
+        db_session.query(id_column.class_).filter(id_column == account[0]).update(
+            {password_column: new_hash}, synchronize_session=False
+        )
+        db_session.commit()
+    return account[0]
+
+@bp.route('/login', methods=['GET', 'POST'])
 def customer_login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
-        db_session = DBSession()
-        customer = db_session.query(Customer).filter_by(username=username, password=password).first()
-        db_session.close()
+        try:
+            customer_id = authenticate(Customer.userid, Customer.password, username, password)
+        except VerifierBusy:
+            return LOGIN_BUSY_RESPONSE
 
-        if customer:
+        if customer_id:
             # Store customer info in the session
-            session['customer_id'] = customer.userid
+            session['customer_id'] = customer_id
+
+            # Move whatever was added to the cart while logged out into the customer's cart
+            guest_cart = session.pop('guest_cart', None)
+            if guest_cart:
+                db_session = DBSession()
+                merge_guest_cart(db_session, customer_id, guest_cart)
+                db_session.commit()
+                return redirect('/cart')
             return redirect('/')
         else:
             return "Login failed. Please check your username and password."
@@ -97,7 +256,7 @@ def customer_login():
 
 
 # Route for logging out
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     # Clear the user session
     session.clear()
@@ -106,19 +265,20 @@ def logout():
 
 
 # Login route for Admin
-@app.route('/admin', methods=['GET', 'POST'])
+@bp.route('/admin', methods=['GET', 'POST'])
 def admin_login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
 
-        db_session = DBSession()
-        admin = db_session.query(Admin).filter_by(username=username, password=password).first()
-        db_session.close()
+        try:
+            admin_id = authenticate(Admin.adminid, Admin.password, username, password)
+        except VerifierBusy:
+            return LOGIN_BUSY_RESPONSE
 
-        if admin:
+        if admin_id:
             # Store admin info in the session
-            session['admin_id'] = admin.adminid
+            session['admin_id'] = admin_id
             return redirect('/admin_home')  # Redirect to admin home on successful login
         else:
             return "Login failed. Please check your username and password."
@@ -126,7 +286,7 @@ def admin_login():
     return render_template('admin_login.html')
 
 # Logout route for Admin
-@app.route('/admin_logout')
+@bp.route('/admin_logout')
 def admin_logout():
     # Check if the admin is logged in
     if 'admin_id' in session:
@@ -137,18 +297,17 @@ def admin_logout():
     return redirect('/admin')
 
 # Add this route to your Flask application
-@app.route('/manage_customers')
+@bp.route('/manage_customers')
 def manage_customers():
     # Retrieve the list of customers from the database
     db_session = DBSession()
     customers = db_session.query(Customer).all()
-    db_session.close()
     
     # Render the manage_customers.html template and pass the customers
     return render_template('manage_customers.html', customers=customers)
 
 # Add this route to your Flask application
-@app.route('/delete_customer/<int:customer_id>')
+@bp.route('/delete_customer/<int:customer_id>')
 def delete_customer(customer_id):
     # Delete the customer with the specified customer_id from the database
     db_session = DBSession()
@@ -156,12 +315,11 @@ def delete_customer(customer_id):
     if customer:
         db_session.delete(customer)
         db_session.commit()
-    db_session.close()
     
     # Redirect back to the manage_customers page
     return redirect('/manage_customers')
 
-@app.route('/manage_admins', methods=['GET', 'POST'])
+@bp.route('/manage_admins', methods=['GET', 'POST'])
 def manage_admins():
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -180,7 +338,7 @@ def manage_admins():
             if existing_admin:
                 flash("Admin with the same username already exists.", 'danger')
             else:
-                new_admin = Admin(username=username, password=password)
+                new_admin = Admin(username=username, password=hash_password(password))
                 db_session.add(new_admin)
                 db_session.commit()
                 flash("Admin created successfully.", 'success')
@@ -202,12 +360,11 @@ def manage_admins():
                 flash("Cannot delete the first admin.", 'danger')
 
     admins = db_session.query(Admin).all()
-    db_session.close()
 
     return render_template('manage_admins.html', admins=admins)
 
 
-@app.route('/manage_categories', methods=['GET', 'POST'])
+@bp.route('/manage_categories', methods=['GET', 'POST'])
 def manage_categories():
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -229,19 +386,17 @@ def manage_categories():
                 if category_to_delete:
                     db_session.delete(category_to_delete)
                     db_session.commit()
+                    catalog_cache.bump()  # Invalidate cached catalog pages
                     flash("Category deleted successfully.", 'success')
                     return redirect('/manage_categories')  # Redirect after successful deletion
                 else:
                     flash("Category not found.", 'danger')
 
-    # Close the session after all database operations are done
-    db_session.close()
-
     return render_template('manage_categories.html', categories=categories)
 
 
 
-@app.route('/create_category', methods=['GET', 'POST'])
+@bp.route('/create_category', methods=['GET', 'POST'])
 def create_category():
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -259,14 +414,13 @@ def create_category():
             new_category = Category(category_name=category_name)
             db_session.add(new_category)
             db_session.commit()
+            catalog_cache.bump()  # Invalidate cached catalog pages
             flash("Category created successfully.", 'success')
             return redirect('/manage_categories')
 
-    db_session.close()
-
     return render_template('create_category.html')
 
-@app.route('/edit_category/<int:category_id>', methods=['GET', 'POST'])
+@bp.route('/edit_category/<int:category_id>', methods=['GET', 'POST'])
 def edit_category(category_id):
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -288,17 +442,16 @@ def edit_category(category_id):
         else:
             category.category_name = new_category_name
             db_session.commit()
+            catalog_cache.bump()  # Invalidate cached catalog pages
             flash("Category edited successfully.", 'success')
             return redirect('/manage_categories')
 
-    db_session.close()
-
     return render_template('edit_category.html', category=category)
 
 
 
 # Route to manage products (show all products, add new product)
-@app.route('/manage_products', methods=['GET', 'POST'])
+@bp.route('/manage_products', methods=['GET', 'POST'])
 def manage_products():
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -312,24 +465,21 @@ def manage_products():
             product_id_to_delete = int(request.form['delete_product'])
             product_to_delete = db_session.query(Product).filter_by(product_id=product_id_to_delete).first()
             if product_to_delete:
-                # Delete product image file if it exists
+                # The image files are deleted by a background job, once nothing refers to them
                 if product_to_delete.image_path:
-                    image_path = os.path.join(app.config['UPLOAD_FOLDER'], product_to_delete.image_path)
-                    if os.path.exists(image_path):
-                        os.remove(image_path)
+                    enqueue_image_deletion(db_session, product_to_delete)
                 db_session.delete(product_to_delete)
                 db_session.commit()
+                catalog_cache.bump()  # Invalidate cached catalog pages
                 flash("Product deleted successfully.", 'success')
                 # Redirect to the manage_products route after deletion
-                return redirect(url_for('manage_products'))
-    # Close the session after rendering the template
-    db_session.close()
+                return redirect(url_for('store.manage_products'))
     return render_template('manage_products.html', products=products, categories=categories)
 
 
 
 # Route to create a new product
-@app.route('/create_product', methods=['GET', 'POST'])
+@bp.route('/create_product', methods=['GET', 'POST'])
 def create_product():
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -343,22 +493,15 @@ def create_product():
         product_price = float(request.form['product_price'])
         description = request.form['description']
         category_id = int(request.form['category_id'])
+        sku = request.form.get('sku', '').strip() or None
+        stock_quantity = max(request.form.get('stock_quantity', 0, type=int), 0)
+
+        if sku and db_session.query(Product.product_id).filter_by(sku=sku).first():
+            flash("A product with this SKU already exists.", 'danger')
+            return render_template('create_product.html', categories=categories)
 
         # Handle image upload
-        if 'product_image' in request.files:
-            image_file = request.files['product_image']
-            if image_file.filename != '':
-                if 'image' not in image_file.mimetype:
-                    flash("Invalid file format. Please upload an image.", 'danger')
-                elif not allowed_file(image_file.filename):
-                    flash("Invalid file extension. Allowed extensions are jpg, jpeg, png, gif.", 'danger')
-                else:
-                    # Securely save the image file
-                    filename = secure_filename(image_file.filename)
-                    image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    image_path = filename
-        else:
-            image_path = None
+        image_path = save_product_image(request.files.get('product_image'))
 
         # Create a new product
         new_product = Product(
@@ -366,23 +509,86 @@ def create_product():
             product_price=product_price,
             description=description,
             category_id=category_id,
-            image_path=image_path  # Save the image path in the database
+            image_path=image_path,  # Save the image path in the database
+            sku=sku,
+            stock_quantity=stock_quantity
         )
         db_session.add(new_product)
+        db_session.flush()  # Assigns new_product.product_id
+        if not sku:
+            new_product.sku = default_sku(new_product.product_id)
+        # Thumbnails are generated by a background job after the response has been sent
+        if image_path:
+            enqueue_image_variants(db_session, new_product.product_id, image_path)
         db_session.commit()
+        catalog_cache.bump()  # Invalidate cached catalog pages
+
         flash("Product created successfully.", 'success')
         return redirect('/manage_products')
 
-    db_session.close()
-
     return render_template('create_product.html', categories=categories)
 
 # Helper function to check allowed file extensions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Helper function to validate and store an uploaded product image under its content hash
+def save_product_image(image_file):
+    if image_file is None or image_file.filename == '':
+        return None
+    if 'image' not in image_file.mimetype:
+        flash("Invalid file format. Please upload an image.", 'danger')
+        return None
+    if not allowed_file(image_file.filename):
+        flash("Invalid file extension. Allowed extensions are jpg, jpeg, png, gif.", 'danger')
+        return None
+    return save_upload(image_file, current_app.config['UPLOAD_FOLDER'])
+
+# Generates the resized copies of a product image (a background job)
+@jobs.task
+def build_image_variants(product_id, image_path):
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    db_session = DBSession()
+    try:
+        # Nothing to do once the image was replaced or deleted: not a failure to retry
+        if not db_session.query(Product.product_id).filter_by(product_id=product_id, image_path=image_path).first() \
+                or not os.path.exists(os.path.join(upload_folder, image_path)):
+            return
+        db_session.rollback()  # Don't hold a read transaction while resizing
+
+        variants = generate_variants(upload_folder, image_path)
+        # Only record the variants if the product still uses this image
+        updated = db_session.query(Product).filter_by(product_id=product_id, image_path=image_path).update(
+            {'image_variants': variants}, synchronize_session=False
+        )
+        db_session.commit()
+        if not updated and not db_session.query(Product.product_id).filter_by(image_path=image_path).first():
+            # The image was dropped while resizing, maybe after its delete job ran
+            delete_image_files(upload_folder, image_path)
+            return
+    finally:
+        DBSession.remove()
+    catalog_cache.bump()
+
+# Deletes an image and its resized copies (a background job) unless a product still
+# uses it: identical uploads are stored once since file names are content hashes
+# (variants is only passed by jobs queued before the files were found by name)
+@jobs.task
+def delete_product_image(image_path, variants=None):
+    if DBSession().query(Product.product_id).filter_by(image_path=image_path).first():
+        return
+    delete_image_files(current_app.config['UPLOAD_FOLDER'], image_path)
+
+# Queue the jobs above in the caller's transaction
+def enqueue_image_variants(db_session, product_id, image_path):
+    jobs.enqueue(db_session, 'build_image_variants', {'product_id': product_id, 'image_path': image_path},
+                 idempotency_key=f'image-variants:{product_id}:{image_path}')
+
+def enqueue_image_deletion(db_session, product):
+    jobs.enqueue(db_session, 'delete_product_image', {'image_path': product.image_path})
+
 # Route to edit an existing product
-@app.route('/edit_product/<int:product_id>', methods=['GET', 'POST'])
+@bp.route('/edit_product/<int:product_id>', methods=['GET', 'POST'])
 def edit_product(product_id):
     # Check if the user is logged in as an admin
     if 'admin_id' not in session:
@@ -404,85 +610,136 @@ def edit_product(product_id):
         product_price = float(request.form['product_price'])
         description = request.form['description']
         category_id = int(request.form['category_id'])
-
-        # Handle image upload
-        if 'product_image' in request.files:
-            image_file = request.files['product_image']
-            if image_file.filename != '':
-                if 'image' not in image_file.mimetype:
-                    flash("Invalid file format. Please upload an image.", 'danger')
-                elif not allowed_file(image_file.filename):
-                    flash("Invalid file extension. Allowed extensions are jpg, jpeg, png, gif.", 'danger')
-                else:
-                    # Securely save the image file
-                    filename = secure_filename(image_file.filename)
-                    image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                    image_path = filename
-                    # Remove the old image file if it exists
-                    if product_to_edit.image_path:
-                        old_image_path = os.path.join(app.config['UPLOAD_FOLDER'], product_to_edit.image_path)
-                        if os.path.exists(old_image_path):
-                            os.remove(old_image_path)
-        else:
-            # If no new image was uploaded, keep the existing image path
-            image_path = product_to_edit.image_path
+        sku = request.form.get('sku', '').strip() or product_to_edit.sku
+        # Apply the change made in the form rather than the number itself, so
+        # units sold while the admin was editing aren't added back
+        stock_delta = (max(request.form.get('stock_quantity', 0, type=int), 0)
+                       - request.form.get('stock_quantity_loaded', 0, type=int))
+
+        if sku != product_to_edit.sku and db_session.query(Product.product_id).filter_by(sku=sku).first():
+            flash("A product with this SKU already exists.", 'danger')
+            return render_template('edit_product.html', product=product_to_edit, categories=categories)
+
+        # Handle image upload; if no new image was uploaded, keep the existing one
+        image_path = save_product_image(request.files.get('product_image'))
+        if image_path and image_path != product_to_edit.image_path:
+            # Queue the removal of the old image files and the thumbnails of the new image
+            if product_to_edit.image_path:
+                enqueue_image_deletion(db_session, product_to_edit)
+            enqueue_image_variants(db_session, product_id, image_path)
+            product_to_edit.image_path = image_path  # Update the image path
+            product_to_edit.image_variants = None
 
         # Update the product
         product_to_edit.product_name = product_name
         product_to_edit.product_price = product_price
         product_to_edit.description = description
         product_to_edit.category_id = category_id
-        product_to_edit.image_path = image_path  # Update the image path
+        product_to_edit.sku = sku
+        if stock_delta:
+            adjust_stock(db_session, product_id, stock_delta)
 
         db_session.commit()
+        catalog_cache.bump()  # Invalidate cached catalog pages
+
         flash("Product updated successfully.", 'success')
         return redirect('/manage_products')
 
-    db_session.close()
-
     return render_template('edit_product.html', product=product_to_edit, categories=categories)
 
+# Bulk product import from a CSV or NDJSON file (see catalog_import.py). The
+# response is plain text streamed while the import runs, one line per chunk.
+@bp.route('/import_products', methods=['GET', 'POST'])
+def import_products():
+    if 'admin_id' not in session:
+        return redirect('/admin_login')
+
+    if request.method == 'GET':
+        return render_template('import_products.html', chunk_size=current_app.config['IMPORT_CHUNK_SIZE'])
+
+    catalog_file = request.files.get('catalog_file')
+    if not catalog_file or not catalog_file.filename:
+        flash("Choose a CSV or NDJSON file to import.", 'danger')
+        return redirect('/import_products')
+    file_format = detect_format(catalog_file.filename, request.form.get('format', 'csv'))
+
+    def generate():
+        progress = []
+        try:
+            report = import_catalog(DBSession(), catalog_file.stream, file_format,
+                                    chunk_size=current_app.config['IMPORT_CHUNK_SIZE'], progress=progress.append)
+        except Exception as e:
+            current_app.logger.exception("Catalog import failed")
+            yield f"Import stopped: {e}\n"
+            if progress:
+                yield f"Written before the error: {progress[-1].summary()}\n"
+            return
+        finally:
+            if progress:
+                catalog_cache.bump()  # Invalidate cached catalog pages
+
+        yield report.summary() + "\n"
+        for line, message in report.errors:
+            yield f"line {line}: {message}\n"
+        if report.error_count > len(report.errors):
+            yield f"... and {report.error_count - len(report.errors)} more\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/plain')
+
+
+# Streams the whole catalog in the import format, ?format=csv (default) or ndjson
+@bp.route('/export_products')
+def export_products():
+    if 'admin_id' not in session:
+        return redirect('/admin_login')
+
+    file_format = request.args.get('format', 'csv')
+    if file_format not in FORMATS:
+        file_format = 'csv'
+    return Response(
+        stream_with_context(export_catalog(DBSession(), file_format, current_app.config['EXPORT_BATCH_SIZE'])),
+        mimetype='text/csv' if file_format == 'csv' else 'application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename=products.{file_format}'}
+    )
+
 # Add a route to view all categories
-@app.route('/view_categories')
+@bp.route('/view_categories')
+@query_budget(1)
+@replica_reads
+@catalog_conditional(catalog_cache)
 def view_categories():
-    db_session = DBSession()
-    categories = db_session.query(Category).all()
-    db_session.close()
+    categories = get_categories()
     return render_template('view_categories.html', categories=categories)
 
 # Add a route to view products by category
-@app.route('/view_products/<int:category_id>')
+@bp.route('/view_products/<int:category_id>')
+@query_budget(2)
+@replica_reads
+@catalog_conditional(catalog_cache)
 def view_products_by_category(category_id):
-    db_session = DBSession()
-    category = db_session.query(Category).filter_by(category_id=category_id).first()
-    if category:
-        products = db_session.query(Product).filter_by(category_id=category_id).all()
-    else:
-        products = []
-    db_session.close()
+    category, products = get_category_products(category_id)
     return render_template('view_products_by_category.html', category=category, products=products)
 
 
 
 # Route to view the cart
-@app.route('/cart', methods=['GET', 'POST'])
+@bp.route('/cart', methods=['GET', 'POST'])
+@query_budget(3)
 def view_cart():
-    # Check if the user is logged in as a customer
+    db_session = DBSession()
+
+    # Visitors who aren't logged in see the guest cart kept in their session
     if 'customer_id' not in session:
-        flash("Please log in to view your cart.", 'danger')
-        return redirect('/login')  # Redirect to the login page if not logged in
+        cart_items = get_guest_cart_items(db_session, session.get('guest_cart', {}))
+        cart_total = sum(cart_item.price * cart_item.quantity for cart_item in cart_items)
+        return render_template('cart.html', cart_items=cart_items, cart_total=cart_total, guest=True)
 
     customer_id = session['customer_id']
-    db_session = DBSession()
-    customer_cart = db_session.query(Cart).filter_by(customer_id=customer_id).first()
-    cart_items = []
-    cart_total = 0
-
-    if customer_cart:
-        # Load the CartItem objects and their associated Product objects in the same session
-        cart_items = db_session.query(CartItem).filter_by(cart_id=customer_cart.cart_id).options(joinedload(CartItem.product)).all()
-        # Calculate the total price
-        cart_total = sum(cart_item.price * cart_item.quantity for cart_item in cart_items)
+
+    # Load the CartItem objects and their associated Product objects in one query
+    cart_items = get_cart_items(db_session, customer_id)
+    # Calculate the total price
+    cart_total = sum(cart_item.price * cart_item.quantity for cart_item in cart_items)
 
     if request.method == 'POST':
         action = request.form.get('action')
@@ -504,93 +761,59 @@ def view_cart():
             else:
                 flash("Product not found in the cart.", 'danger')
 
-    # Close the session
-    db_session.close()
-
     return render_template('cart.html', cart_items=cart_items,cart_total=cart_total)
 
 
+# Adds a product to the guest cart in the session of a visitor who isn't logged in.
+# Nothing is read or written: unknown or sold out products are dropped at login.
+def add_to_session_cart(product_id):
+    guest_cart = add_to_guest_cart(session.get('guest_cart', {}), product_id)
+    if guest_cart is None:
+        flash("Your cart is full. Please log in to add more products.", 'danger')
+    else:
+        session['guest_cart'] = guest_cart
+        flash("Product added to the cart.", 'success')
+    return redirect('/cart')
+
 # Route to add a product to the cart
-@app.route('/add_to_cart/<int:product_id>')
+@bp.route('/add_to_cart/<int:product_id>')
+@query_budget(3)
 def add_to_cart(product_id):
-    # Check if the user is logged in as a customer
+    # Visitors who aren't logged in get a guest cart
     if 'customer_id' not in session:
-        return redirect('/login')  # Redirect to the login page if not logged in
+        return add_to_session_cart(product_id)
 
     customer_id = session['customer_id']
     db_session = DBSession()
-    
-    # Check if the customer already has a cart, create one if not
-    customer_cart = db_session.query(Cart).filter_by(customer_id=customer_id).first()
-    if not customer_cart:
-        customer_cart = Cart(customer_id=customer_id)
-        db_session.add(customer_cart)
-        db_session.commit()
-
-    # Retrieve the product with the specified product_id
-    product = db_session.query(Product).filter_by(product_id=product_id).first()
-
-    if product:
-        # Check if the product is already in the cart, update quantity if so
-        existing_cart_item = db_session.query(CartItem).filter_by(cart_id=customer_cart.cart_id, product_id=product_id).first()
-        if existing_cart_item:
-            existing_cart_item.quantity += 1
-        else:
-            cart_item = CartItem(cart_id=customer_cart.cart_id, product_id=product_id, quantity=1, price=product.product_price)
-            db_session.add(cart_item)
 
+    # Insert the item or increment its quantity in a single upsert
+    if add_product_to_cart(db_session, customer_id, product_id):
         db_session.commit()
-        db_session.close()
         flash("Product added to the cart.", 'success')
-        return redirect('/cart')
     else:
-        db_session.close()
-        flash("Product not found.", 'danger')
+        flash("Product not found or out of stock.", 'danger')
 
     return redirect('/cart')  # Redirect to the cart page
 
 
-@app.route('/order_product/<int:product_id>', methods=['GET', 'POST'])
+@bp.route('/order_product/<int:product_id>', methods=['GET', 'POST'])
+@query_budget(3)
 def order_product(product_id):
     try:
-        # Check if the user is logged in as a customer
+        # Visitors who aren't logged in get a guest cart
         if 'customer_id' not in session:
-            flash("Please log in to order products.", 'danger')
-            return redirect('/login')  # Redirect to the login page if not logged in
+            return add_to_session_cart(product_id)
 
         customer_id = session['customer_id']
         db_session = DBSession()
 
-        # Retrieve the product with the specified product_id
-        product = db_session.query(Product).filter_by(product_id=product_id).first()
-
-        if product:
-            # Check if the product is already in the cart, update quantity if so
-            customer_cart = db_session.query(Cart).filter_by(customer_id=customer_id).first()
-            if customer_cart:
-                existing_cart_item = db_session.query(CartItem).filter_by(
-                    cart_id=customer_cart.cart_id,
-                    product_id=product_id
-                ).first()
-                if existing_cart_item:
-                    existing_cart_item.quantity += 1
-                    flash("Product quantity updated in the cart.", 'success')
-                else:
-                    cart_item = CartItem(
-                        cart_id=customer_cart.cart_id,
-                        product_id=product_id,
-                        quantity=1,
-                        price=product.product_price
-                    )
-                    db_session.add(cart_item)
-                    flash("Product added to the cart.", 'success')
-
-                db_session.commit()
-                return redirect('/cart')
-            else:
-                flash("Cart not found. Please create a cart before ordering products.", 'danger')
+        # Add the product to the cart (or bump its quantity) and go to the cart
+        if add_product_to_cart(db_session, customer_id, product_id):
+            db_session.commit()
+            flash("Product added to the cart.", 'success')
+            return redirect('/cart')
         else:
-            flash("Product not found.", 'danger')
+            flash("Product not found or out of stock.", 'danger')
 
         return redirect('/')  # Redirect to the home page if there's an error or if the product doesn't exist
     except Exception as e:
@@ -598,11 +821,17 @@ def order_product(product_id):
         print(str(e))
         flash("An error occurred while ordering the product. Please try again later.", 'danger')
         return redirect('/cart')
-    finally:
-        db_session.close()  # Make sure to close the session in all cases
+
+# Route for updating the guest cart; a quantity of 0 removes the product
+@bp.route('/update_guest_cart/<int:product_id>', methods=['POST'])
+@query_budget(0)
+def update_guest_cart(product_id):
+    quantity = request.form.get('quantity', 0, type=int)
+    session['guest_cart'] = set_guest_cart_quantity(session.get('guest_cart', {}), product_id, quantity)
+    return redirect('/cart')
 
 # Route for updating the cart
-@app.route('/update_cart/<int:cart_item_id>', methods=['POST'])
+@bp.route('/update_cart/<int:cart_item_id>', methods=['POST'])
 def update_cart(cart_item_id):
     try:
         # Check if the user is logged in as a customer
@@ -637,22 +866,45 @@ def update_cart(cart_item_id):
         print(str(e))
         flash("An error occurred while updating the cart. Please try again later.", 'danger')
         return redirect('/cart')
-    finally:
-        db_session.close()  # Make sure to close the session in all cases
 
 
 # Route for managing orders
-@app.route('/manage_orders')
+@bp.route('/manage_orders')
+@query_budget(2)
 def manage_orders():
-    # Retrieve order details from the database
-    
+    # Retrieve a page of orders, newest first, with their customer in one query and
+    # all their order lines with products in a second one, so the template never
+    # lazy loads row by row
+    after, per_page = get_page_args(current_app.config['ORDERS_PER_PAGE'], current_app.config['MAX_ORDERS_PER_PAGE'])
+    orders, next_cursor = keyset_page(DBSession(), select(Order).options(
+        joinedload(Order.customer),
+        selectinload(Order.lines).joinedload(OrderLine.product)
+    ), Order.order_id, after, per_page, descending=True)
+
+    return render_template('manage_orders.html', orders=orders, after=after,
+                           next_cursor=next_cursor, per_page=per_page)
+
+# Revenue and units per day, category and product over the last ?days= days (0 = all time),
+# read from the sales_daily summary table rather than the order history
+@bp.route('/admin/analytics')
+@query_budget(3)
+def admin_analytics():
+    if 'admin_id' not in session:
+        return redirect('/admin')
+
+    days = max(request.args.get('days', 30, type=int), 0)
     db_session = DBSession()
-    orders = db_session.query(Order).all()
-    
-    return render_template('manage_orders.html', orders=orders)
+    return render_template(
+        'admin_analytics.html',
+        days=days,
+        by_day=analytics.sales_by_day(db_session, days),
+        by_category=analytics.sales_by_category(db_session, days),
+        top_products=analytics.top_products(db_session, days)
+    )
 
 # Route for checkout
-@app.route('/checkout', methods=['GET', 'POST'])
+@bp.route('/checkout', methods=['GET', 'POST'])
+@query_budget(6)
 def checkout():
     # Check if the user is logged in as a customer
     if 'customer_id' not in session:
@@ -664,78 +916,81 @@ def checkout():
         address = request.form['address']
         phone = request.form['phone']
 
+        db_session = DBSession()
+
         # Get the cart items for the customer
-        cart_items = get_cart_items(customer_id)
+        cart_items = get_cart_items(db_session, customer_id)
 
         if not cart_items:
             flash("Your cart is empty. Add products to your cart before checking out.", 'danger')
             return redirect('/cart')
 
+        # Placing the order and emptying the cart happen in one transaction: either
+        # both are committed or, if anything fails, neither is
         try:
-            db_session = DBSession()
-
-            # Iterate through cart items and create an order for each
-            for cart_item in cart_items:
-                order = Order(
-                    product_id=cart_item.product_id,
-                    quantity=cart_item.quantity,
-                    address=address,
-                    phone_number=phone,
-                    customer_id=customer_id  # Store the customer_id in the order
-                )
-                db_session.add(order)
+            # Take the stock first, one conditional UPDATE per line: if a product has
+            # run out since it was added to the cart nothing is written
+            if not reserve_stock(db_session, [(cart_item.product_id, cart_item.quantity) for cart_item in cart_items]):
+                db_session.rollback()
+                flash("Some products in your cart don't have enough stock left. Please update your cart.", 'danger')
+                return redirect('/cart')
 
-            db_session.commit()
+            # One order header per checkout
+            order = Order(
+                customer_id=customer_id,
+                address=address,
+                phone_number=phone
+            )
+            db_session.add(order)
+            db_session.flush()  # Assigns order.order_id
+
+            # All order lines in a single executemany INSERT, snapshotting the cart price
+            db_session.execute(insert(OrderLine), [
+                {
+                    'order_id': order.order_id,
+                    'product_id': cart_item.product_id,
+                    'quantity': cart_item.quantity,
+                    'unit_price': cart_item.price
+                }
+                for cart_item in cart_items
+            ])
+
+            # Add the order to the sales summary behind the admin analytics page
+            analytics.record_sales(db_session, order.created_at.date(), [
+                (cart_item.product_id, cart_item.product.category_id if cart_item.product else None,
+                 cart_item.quantity, cart_item.price)
+                for cart_item in cart_items
+            ])
+
+            # Clear the customer's cart
+            db_session.query(CartItem).filter(
+                CartItem.cart_item_id.in_([cart_item.cart_item_id for cart_item in cart_items])
+            ).delete(synchronize_session=False)
 
-            # Clear the customer's cart after placing the order
-            clear_cart(customer_id)
+            db_session.commit()
 
             flash("Order placed successfully. Thank you!", 'success')
             return redirect('/')  # Redirect to the home page or order history page
 
         except Exception as e:
             # Handle any exceptions, log them, and provide a generic error message
+            db_session.rollback()
             print(str(e))
             flash("An error occurred while placing the order. Please try again later.", 'danger')
             return redirect('/cart')
-        finally:
-            db_session.close()  # Make sure to close the session in all cases
 
     return render_template('checkout.html')
 
-# Function to retrieve cart items for a customer
-def get_cart_items(customer_id):
-    db_session = DBSession()
-    customer_cart = db_session.query(Cart).filter_by(customer_id=customer_id).first()
-    cart_items = []
-
-    if customer_cart:
-        # Load the CartItem objects and their associated Product objects in the same session
-        cart_items = db_session.query(CartItem).filter_by(cart_id=customer_cart.cart_id).options(joinedload(CartItem.product)).all()
-
-    db_session.close()
-    return cart_items
-
-# Add this function to your Flask application
-
-def clear_cart(customer_id):
-    try:
-        db_session = DBSession()
-        customer_cart = db_session.query(Cart).filter_by(customer_id=customer_id).first()
-
-        if customer_cart:
-            # Delete all cart items associated with the customer's cart
-            db_session.query(CartItem).filter_by(cart_id=customer_cart.cart_id).delete()
-            db_session.commit()
-    except Exception as e:
-        # Handle any exceptions, log them, and provide a generic error message
-        print(str(e))
-    finally:
-        db_session.close()
+# Function to retrieve cart items (with their products) for a customer in one query
+def get_cart_items(db_session, customer_id):
+    return db_session.query(CartItem).join(Cart).filter(
+        Cart.customer_id == customer_id
+    ).options(joinedload(CartItem.product)).order_by(CartItem.cart_item_id).all()
 
 
 
-@app.route('/customer/orders', methods=['GET'])
+@bp.route('/customer/orders', methods=['GET'])
+@query_budget(2)
 def customer_orders():
     # Check if the user is logged in as a customer
     if 'customer_id' not in session:
@@ -746,9 +1001,14 @@ def customer_orders():
         db_session = DBSession()
         # Get the customer's orders using the current SQLAlchemy session
         customer_id = session['customer_id']
-        customer_orders = db_session.query(Order).filter_by(customer_id=customer_id).all()
+        after, per_page = get_page_args(current_app.config['ORDERS_PER_PAGE'],
+                                        current_app.config['MAX_ORDERS_PER_PAGE'])
+        customer_orders, next_cursor = keyset_page(db_session, select(Order).filter_by(customer_id=customer_id).options(
+            selectinload(Order.lines).joinedload(OrderLine.product)
+        ), Order.order_id, after, per_page, descending=True)
 
-        return render_template('customer_orders.html', orders=customer_orders)
+        return render_template('customer_orders.html', orders=customer_orders, after=after,
+                               next_cursor=next_cursor, per_page=per_page)
 
     except Exception as e:
         # Handle any exceptions here (e.g., logging, displaying an error message)
@@ -756,58 +1016,173 @@ def customer_orders():
         flash("An error occurred while fetching your orders. Please try again later.", 'danger')
         return redirect('/')
 
-@app.route('/search', methods=['GET'])
+@bp.route('/search', methods=['GET'])
+@query_budget(1)
+@replica_reads
 def search():
     # Get the search query from the URL parameter 'query'
     query = request.args.get('query', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
 
-    # Perform the search in your database
+    # Perform a ranked full-text search; fetch one extra row to know if there is a next page
     db_session = DBSession()
-    products = db_session.query(Product).filter(
-        or_(
-            Product.product_name.ilike(f'%{query}%'),
-            Product.description.ilike(f'%{query}%'),
-            Product.category.has(Category.category_name.ilike(f'%{query}%'))
-        )
-    ).all()
-    
-    db_session.close()
+    search_args = dict(limit=per_page + 1, offset=(page - 1) * per_page,
+                       use_fts=current_app.config['SEARCH_FTS_ENABLED'])
+    try:
+        products = search_products(db_session, query, **search_args)
+    except OperationalError:
+        # A replica copied before the primary had its FTS table (the app creates
+        # it on the primary only): search the primary instead
+        if db_session.replica is None:
+            raise
+        current_app.logger.warning("Search index missing on a read replica, searching the primary")
+        db_session.rollback()
+        db.pin_to_primary()
+        products = search_products(db_session, query, **search_args)
+    has_next = len(products) > per_page
+    products = products[:per_page]
 
     # Render a template to display the search results
-    return render_template('search_results.html', query=query, products=products)
+    return render_template('search_results.html', query=query, products=products,
+                           page=page, has_next=has_next)
 
-@app.route('/api/products')
+@bp.route('/api/products')
+@query_budget(1)
+@replica_reads
+@catalog_conditional(catalog_cache)
 def get_products_api():
-    db_session = DBSession()
-    products = db_session.query(Product).all()
-    db_session.close()
+    # ?stream=1 returns the whole catalog as one JSON array, ?format=ndjson as one
+    # product per line; both are written out while the rows are still being read
+    if request.args.get('format') == 'ndjson':
+        return Response(stream_with_context(ndjson_chunks(iter_product_batches())),
+                        mimetype='application/x-ndjson')
+    if request.args.get('stream'):
+        return Response(stream_with_context(json_array_chunks(iter_product_batches())),
+                        mimetype='application/json')
+
+    after, per_page = get_page_args(current_app.config['PRODUCTS_PER_PAGE'], current_app.config['MAX_PRODUCTS_PER_PAGE'])
+
+    # Products come back from the cache already serialized
+    products_data, next_cursor = get_product_page(after, per_page)
     
-    # Serialize products into JSON format
-    products_data = [
-        {
-            'product_id': product.product_id,
-            'product_name': product.product_name,
-            'product_price': product.product_price,
-            'description': product.description,
-            'category_id': product.category_id,
-            'image_path': product.image_path
-        }
-        for product in products
-    ]
-    
-    return jsonify(products_data)
-
-@app.route('/api/categories')
+    # 'next' is the cursor to pass as ?after= for the following page (null on the last page)
+    return jsonify({'products': products_data, 'next': next_cursor})
+
+# Yields every product as lists of dicts, EXPORT_BATCH_SIZE rows at a time, so
+# memory use doesn't grow with the size of the catalog
+def iter_product_batches():
+    result = DBSession().execute(
+        select(Product).order_by(Product.product_id).execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+    )
+    for products in result.scalars().partitions():
+        yield [product_to_dict(product) for product in products]
+
+@bp.route('/api/categories')
+@query_budget(1)
+@replica_reads
+@catalog_conditional(catalog_cache)
 def get_categories_api():
-    db_session = DBSession()
-    categories = db_session.query(Category).all()
-    db_session.close()
+    categories = get_categories()
     
     # Serialize categories into JSON format
-    categories_data = [{'id': category.category_id, 'name': category.category_name} for category in categories]
+    categories_data = [{'id': category['category_id'], 'name': category['category_name']} for category in categories]
     
     return jsonify(categories_data)
 
 
+# Generate thumbnails for products that don't have them yet (e.g. images uploaded
+# before the image pipeline existed): FLASK_APP=main flask process-images
+@bp.cli.command('process-images')
+def process_images_command():
+    db_session = DBSession()
+    products = db_session.query(Product.product_id, Product.image_path).filter(
+        Product.image_path.isnot(None),
+        Product.image_variants.is_(None)
+    ).all()
+
+    for product_id, image_path in products:
+        if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], image_path)):
+            print(f"Skipping product {product_id}: {image_path} not found")
+            continue
+        build_image_variants(product_id, image_path)
+        print(f"Processed {image_path}")
+
+
+# FLASK_APP=main flask import-products supplier.csv
+@bp.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help="Defaults to the file extension")
+@click.option('--chunk-size', default=1000, show_default=True, help="Products written per transaction")
+def import_products_command(path, file_format, chunk_size):
+    def progress(report):
+        print(f"{report.rows} rows read, {report.inserted} added, {report.updated} updated")
+
+    with open(path, 'rb') as catalog_file:
+        try:
+            report = import_catalog(DBSession(), catalog_file, file_format or detect_format(path),
+                                    chunk_size=chunk_size, progress=progress)
+        finally:
+            catalog_cache.bump()
+    print(report.summary())
+    for line, message in report.errors:
+        print(f"line {line}: {message}")
+
+
+# FLASK_APP=main flask export-products products.csv
+@bp.cli.command('export-products')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help="Defaults to the file extension")
+def export_products_command(path, file_format):
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        for chunk in export_catalog(DBSession(), file_format or detect_format(path)):
+            out.write(chunk)
+    print(f"Exported the catalog to {path}")
+
+
+# Fingerprint and precompress the static files: FLASK_APP=main flask build-static
+@bp.cli.command('build-static')
+def build_static_command():
+    manifest = static_assets.build_static_assets(current_app.static_folder)
+    print(f"Fingerprinted {len(manifest)} static files")
+
+
+# Recompute the sales summary from the order history: FLASK_APP=main flask rebuild-sales-summary
+@bp.cli.command('rebuild-sales-summary')
+def rebuild_sales_summary_command():
+    db_session = DBSession()
+    rows = analytics.rebuild_sales_summary(db_session)
+    db_session.commit()
+    print(f"Rebuilt the sales summary: {rows} rows")
+
+
+# Run queued background jobs: FLASK_APP=main flask run-worker
+@bp.cli.command('run-worker')
+@click.option('--threads', default=4, show_default=True, help="Worker threads per process")
+@click.option('--processes', default=1, show_default=True, help="Worker processes to fork")
+@click.option('--burst', is_flag=True, help="Exit once no job is ready instead of waiting for more")
+def run_worker_command(threads, processes, burst):
+    app = current_app._get_current_object()
+    jobs.run_workers(app, threads, processes, burst)
+    counts = jobs.count_jobs(app)
+    print(', '.join(f"{count} {status}" for status, count in sorted(counts.items())) or "No jobs")
+
+
+@bp.cli.command('calibrate-passwords')
+@click.option('--target-ms', default=250, show_default=True, help="Wanted time to hash or verify one password")
+@click.option('--memory-kib', default=64 * 1024, show_default=True)
+@click.option('--parallelism', default=4, show_default=True)
+def calibrate_passwords_command(target_ms, memory_kib, parallelism):
+    # Picks the argon2 time cost for a target login latency on this machine
+    time_cost = None
+    for time_cost, median_ms in passwords.calibrate(target_ms, memory_kib, parallelism):
+        print(f"time_cost={time_cost}: {median_ms:.1f} ms")
+    print("Set in config.py:")
+    print(f"PASSWORD_HASH_TIME_COST = {time_cost}")
+    print(f"PASSWORD_HASH_MEMORY_COST = {memory_kib}")
+    print(f"PASSWORD_HASH_PARALLELISM = {parallelism}")
+    print("Existing hashes are upgraded the next time each user logs in.")
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=81)
+    create_app().run(host='0.0.0.0', port=81)
@@ -0,0 +1,29 @@
+"""add product image variants
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18 16:20:45.127093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created from models.py after the image pipeline existed already have it
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('products')}
+    if 'image_variants' not in columns:
+        with op.batch_alter_table('products', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
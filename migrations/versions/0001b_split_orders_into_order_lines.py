@@ -0,0 +1,76 @@
+"""split orders into order headers and order lines
+
+Before this revision every orders row was one product of a checkout
+(orders.product_id, orders.quantity). Each of those rows becomes an order
+header with a single order line, priced at the product's current price since
+the price paid was never stored. Orders of deleted products keep their line
+with a NULL product and a price of 0.
+
+Databases whose orders table was already split (created from models.py before
+migrations existed) are left as they are.
+
+Revision ID: 0001b
+Revises: 0001a
+Create Date: 2026-10-18 16:02:11.308514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001b'
+down_revision = '0001a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if 'order_lines' not in inspector.get_table_names():
+        op.create_table('order_lines',
+        sa.Column('line_id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['order_id'], ['orders.order_id'], ),
+        sa.ForeignKeyConstraint(['product_id'], ['products.product_id'], ),
+        sa.PrimaryKeyConstraint('line_id')
+        )
+
+    order_columns = {column['name'] for column in inspector.get_columns('orders')}
+    if 'product_id' in order_columns:
+        # One line per legacy order row, keeping the order_id so links to it still work
+        op.execute(
+            "INSERT INTO order_lines (order_id, product_id, quantity, unit_price) "
+            "SELECT orders.order_id, products.product_id, orders.quantity, COALESCE(products.product_price, 0) "
+            "FROM orders LEFT JOIN products ON products.product_id = orders.product_id "
+            "ORDER BY orders.order_id"
+        )
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        if 'created_at' not in order_columns:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        if 'product_id' in order_columns:
+            batch_op.drop_column('product_id')
+        if 'quantity' in order_columns:
+            batch_op.drop_column('quantity')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('quantity', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.create_foreign_key('fk_orders_product_id', 'products', ['product_id'], ['product_id'])
+        batch_op.drop_column('created_at')
+
+    # An order row held a single product: orders with several lines keep their first one
+    op.execute(
+        "UPDATE orders SET "
+        "product_id = (SELECT product_id FROM order_lines WHERE order_lines.order_id = orders.order_id "
+        "ORDER BY line_id LIMIT 1), "
+        "quantity = COALESCE((SELECT quantity FROM order_lines WHERE order_lines.order_id = orders.order_id "
+        "ORDER BY line_id LIMIT 1), 1)"
+    )
+    op.drop_table('order_lines')
@@ -0,0 +1,68 @@
+"""add cart unique indexes
+
+One cart per customer and one row per product per cart, which the
+add-to-cart upsert relies on. Duplicates left behind by concurrent clicks
+before this revision are merged first: a customer's extra carts are folded
+into their oldest one, then rows of the same product in a cart are summed
+into the oldest row.
+
+Revision ID: 0001c
+Revises: 0001b
+Create Date: 2026-10-18 16:21:30.584410
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001c'
+down_revision = '0001b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    cart_indexes = {index['name'] for index in inspector.get_indexes('carts')}
+    cart_item_indexes = {index['name'] for index in inspector.get_indexes('cart_items')}
+
+    if 'uq_carts_customer_id' not in cart_indexes:
+        op.execute(
+            "UPDATE cart_items SET cart_id = ("
+            "SELECT MIN(kept.cart_id) FROM carts AS kept JOIN carts AS extra "
+            "ON extra.customer_id = kept.customer_id WHERE extra.cart_id = cart_items.cart_id) "
+            "WHERE cart_id IN (SELECT cart_id FROM carts WHERE customer_id IS NOT NULL AND cart_id > ("
+            "SELECT MIN(cart_id) FROM carts AS kept WHERE kept.customer_id = carts.customer_id))"
+        )
+        op.execute(
+            "DELETE FROM carts WHERE customer_id IS NOT NULL AND cart_id > ("
+            "SELECT MIN(cart_id) FROM carts AS kept WHERE kept.customer_id = carts.customer_id)"
+        )
+        with op.batch_alter_table('carts', schema=None) as batch_op:
+            batch_op.create_index('uq_carts_customer_id', ['customer_id'], unique=True)
+
+    if 'uq_cart_items_cart_id_product_id' not in cart_item_indexes:
+        op.execute(
+            "UPDATE cart_items SET quantity = ("
+            "SELECT SUM(same.quantity) FROM cart_items AS same "
+            "WHERE same.cart_id = cart_items.cart_id AND same.product_id = cart_items.product_id) "
+            "WHERE cart_item_id IN (SELECT MIN(cart_item_id) FROM cart_items "
+            "WHERE cart_id IS NOT NULL AND product_id IS NOT NULL "
+            "GROUP BY cart_id, product_id HAVING COUNT(*) > 1)"
+        )
+        op.execute(
+            "DELETE FROM cart_items WHERE cart_id IS NOT NULL AND product_id IS NOT NULL "
+            "AND cart_item_id > (SELECT MIN(cart_item_id) FROM cart_items AS same "
+            "WHERE same.cart_id = cart_items.cart_id AND same.product_id = cart_items.product_id)"
+        )
+        with op.batch_alter_table('cart_items', schema=None) as batch_op:
+            batch_op.create_index('uq_cart_items_cart_id_product_id', ['cart_id', 'product_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.drop_index('uq_cart_items_cart_id_product_id')
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.drop_index('uq_carts_customer_id')
@@ -1,11 +1,10 @@
-from sqlalchemy import (Column, Float, ForeignKey, Integer, Sequence, String,
-                        create_engine)
+from datetime import datetime
+
+from sqlalchemy import (JSON, Column, Date, DateTime, Float, ForeignKey, Index,
+                        Integer, Sequence, String, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
-DATABASE_URL = 'sqlite:///mygrocerystore.db'
-engine = create_engine(DATABASE_URL, echo=True)
-
 Base = declarative_base()
 
 class Customer(Base):
@@ -29,30 +28,68 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = 'products'
+    __table_args__ = (
+        Index('uq_products_sku', 'sku', unique=True),  # Bulk imports upsert on the SKU
+    )
     product_id = Column(Integer, Sequence('product_id_seq'), primary_key=True, autoincrement=True)
-    category_id = Column(Integer, ForeignKey('categories.category_id'))
+    category_id = Column(Integer, ForeignKey('categories.category_id'), index=True)
     product_name = Column(String, nullable=False)
     product_price = Column(Float, nullable=False)
     description = Column(String)
     image_path = Column(String)
+    image_variants = Column(JSON)  # Resized copies of image_path, see images.py
+    sku = Column(String)  # Supplier stock keeping unit, the key for bulk imports
+    # Units on hand, only ever decremented with a conditional UPDATE (see inventory.py)
+    stock_quantity = Column(Integer, nullable=False, default=0, server_default='0')
 
     category = relationship("Category", back_populates="products")
 
 class Order(Base):
     __tablename__ = 'orders'
     order_id = Column(Integer, Sequence('order_id_seq'), primary_key=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey('products.product_id'))
-    quantity = Column(Integer, nullable=False)
     address = Column(String, nullable=False)
     phone_number = Column(String, nullable=False)
-    customer_id = Column(Integer, ForeignKey('customers.userid'))  # Add a foreign key relationship
-    
+    customer_id = Column(Integer, ForeignKey('customers.userid'), index=True)  # Add a foreign key relationship
+    created_at = Column(DateTime, default=datetime.utcnow)  # NULL for orders placed before this column existed
+
+    customer = relationship("Customer")  # Add a relationship to the Customer class
+    # One order per checkout, with one line per product
+    lines = relationship("OrderLine", back_populates="order", order_by="OrderLine.line_id")
+
+    @property
+    def total(self):
+        return sum(line.unit_price * line.quantity for line in self.lines)
+
+class OrderLine(Base):
+    __tablename__ = 'order_lines'
+    line_id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey('orders.order_id'), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey('products.product_id'), index=True)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)  # Price per unit at the time of checkout
+
+    order = relationship("Order", back_populates="lines")
     # Define a relationship to the Product class
     product = relationship("Product")
-    customer = relationship("Customer")  # Add a relationship to the Customer class
+
+class SalesDaily(Base):
+    # Units and revenue per product per day, kept up to date by checkout (see analytics.py)
+    __tablename__ = 'sales_daily'
+    __table_args__ = (
+        Index('uq_sales_daily_day_product_id', 'day', 'product_id', unique=True),
+    )
+    id = Column(Integer, primary_key=True)
+    day = Column(Date)  # UTC date of the orders; NULL for orders placed before dates were recorded
+    product_id = Column(Integer, ForeignKey('products.product_id'))
+    category_id = Column(Integer, ForeignKey('categories.category_id'), index=True)  # Category when sold
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
     
 class Cart(Base):
     __tablename__ = 'carts'
+    __table_args__ = (
+        Index('uq_carts_customer_id', 'customer_id', unique=True),  # One cart per customer
+    )
     cart_id = Column(Integer, primary_key=True)
     customer_id = Column(Integer, ForeignKey('customers.userid'))
     
@@ -61,6 +98,10 @@ class Cart(Base):
 
 class CartItem(Base):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        # One row per product per cart; add-to-cart upserts on this
+        Index('uq_cart_items_cart_id_product_id', 'cart_id', 'product_id', unique=True),
+    )
     cart_item_id = Column(Integer, primary_key=True)
     cart_id = Column(Integer, ForeignKey('carts.cart_id'))
     product_id = Column(Integer, ForeignKey('products.product_id'))
@@ -71,4 +112,27 @@ class CartItem(Base):
     cart = relationship("Cart", back_populates="cart_items")
     
     # Define a relationship to the Product class
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+
+class Job(Base):
+    # Background work queued by requests and run by workers (see jobs.py)
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        Index('ix_jobs_status_run_at', 'status', 'run_at'),  # Workers claim the oldest ready job
+        # At most one unfinished job per key; enqueueing it again is a no-op
+        Index('uq_jobs_idempotency_key', 'idempotency_key', unique=True,
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)  # Task to run, a function registered with @jobs.task
+    payload = Column(JSON)  # Keyword arguments for the task
+    idempotency_key = Column(String)
+    status = Column(String, nullable=False, default='queued')  # queued, running, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # Not before this time (UTC)
+    locked_by = Column(String)  # Claim token of the worker running it
+    locked_at = Column(DateTime)
+    last_error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
@@ -0,0 +1,48 @@
+from flask import request
+
+# Keyset (cursor) pagination helpers.
+#
+# Instead of OFFSET, every page is fetched with "WHERE key > :after ORDER BY key
+# LIMIT :n", which walks the primary key index directly, so page 1000 costs the
+# same as page 1 no matter how large the table grows.
+
+
+def _to_int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def page_args(after, per_page, default_per_page, max_per_page):
+    # Parses raw query string values; invalid numbers are ignored like Flask's type=int
+    per_page = _to_int(per_page, default_per_page)
+    return _to_int(after), max(1, min(per_page, max_per_page))
+
+
+def get_page_args(default_per_page, max_per_page):
+    # 'after' is the cursor returned with the previous page, 'per_page' is optional
+    return page_args(request.args.get('after'), request.args.get('per_page'), default_per_page, max_per_page)
+
+
+def keyset_statement(stmt, key_column, after, per_page, descending=False):
+    # With descending, pages run from the highest key down (newest first)
+    if after is not None:
+        stmt = stmt.where(key_column < after if descending else key_column > after)
+
+    # Fetch one extra row to find out whether there is a next page
+    return stmt.order_by(key_column.desc() if descending else key_column).limit(per_page + 1)
+
+
+def split_page(rows, key_column, per_page):
+    # Returns the rows of the page and the cursor of the next one (None on the last page)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = getattr(rows[-1], key_column.key)
+    return rows, next_cursor
+
+
+def keyset_page(db_session, stmt, key_column, after, per_page, descending=False):
+    rows = db_session.execute(keyset_statement(stmt, key_column, after, per_page, descending)).scalars().all()
+    return split_page(rows, key_column, per_page)
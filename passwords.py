@@ -0,0 +1,113 @@
+import hmac
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+
+# Password hashing.
+#
+# Passwords are stored as argon2id hashes. Accounts created before hashing was
+# introduced still hold the plaintext password; they are verified with a
+# constant-time comparison and rehashed on their next successful login, as are
+# hashes made with older cost parameters.
+#
+# Verifying a hash is deliberately slow (tens to hundreds of ms of CPU), so it
+# runs on a small thread pool (argon2 releases the GIL while hashing). At most
+# PASSWORD_VERIFY_WORKERS + PASSWORD_VERIFY_QUEUE logins are in flight per
+# process; beyond that verify_password() raises VerifierBusy at once and the
+# route answers 503, instead of every worker thread piling up behind the hashes.
+
+ARGON2_PREFIX = '$argon2'
+
+_hasher = PasswordHasher()
+_executor = None
+_slots = None
+_dummy_hash = None
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+def create_hasher(time_cost, memory_cost, parallelism):
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def hash_password(password):
+    return _hasher.hash(password)
+
+
+def _check(stored, password):
+    # Returns (matches, new hash to store or None)
+    if not stored.startswith(ARGON2_PREFIX):
+        # Legacy plaintext row
+        if hmac.compare_digest(stored.encode(), password.encode()):
+            return True, _hasher.hash(password)
+        return False, None
+
+    try:
+        _hasher.verify(stored, password)
+    except (VerificationError, InvalidHash):
+        return False, None
+    if _hasher.check_needs_rehash(stored):
+        return True, _hasher.hash(password)
+    return True, None
+
+
+def verify_password(stored, password, timeout=None):
+    # stored is None for an unknown username: a dummy hash is checked anyway so
+    # the response time doesn't reveal which usernames exist
+    global _dummy_hash
+    unknown_user = stored is None
+    if unknown_user:
+        if _dummy_hash is None:
+            _dummy_hash = _hasher.hash('dummy password')
+        stored = _dummy_hash
+
+    if _executor is None:
+        matches, new_hash = _check(stored, password)
+    else:
+        if not _slots.acquire(blocking=False):
+            raise VerifierBusy()
+        future = _executor.submit(_check, stored, password)
+        # The slot is freed when the hash finishes, even if this request gave up waiting
+        future.add_done_callback(lambda future: _slots.release())
+        try:
+            matches, new_hash = future.result(timeout)
+        except FutureTimeout:
+            raise VerifierBusy()
+    if unknown_user:
+        return False, None
+    return matches, new_hash
+
+
+def calibrate(target_ms, memory_cost, parallelism, samples=5, max_time_cost=20):
+    # Smallest time_cost whose median hash time reaches target_ms on this machine
+    for time_cost in range(1, max_time_cost + 1):
+        hasher = create_hasher(time_cost, memory_cost, parallelism)
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            hasher.hash('calibration password')
+            timings.append((time.perf_counter() - start) * 1000)
+        median_ms = statistics.median(timings)
+        yield time_cost, median_ms
+        if median_ms >= target_ms:
+            return
+
+
+def init_app(app):
+    global _hasher, _executor, _slots, _dummy_hash
+    _hasher = create_hasher(
+        app.config['PASSWORD_HASH_TIME_COST'],
+        app.config['PASSWORD_HASH_MEMORY_COST'],
+        app.config['PASSWORD_HASH_PARALLELISM']
+    )
+    _dummy_hash = None
+    workers = app.config['PASSWORD_VERIFY_WORKERS']
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+    _slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_VERIFY_QUEUE'])
@@ -0,0 +1,66 @@
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from db import on_engine_created
+
+# Per-route SQL statement budgets.
+#
+# Every statement sent through the engine is counted for the current request.
+# When a route runs more statements than its budget allows we either raise
+# (QUERY_BUDGET_ENFORCED, on by default under app.testing) or log a warning, so
+# an N+1 regression such as a lazy load inside a template loop shows up at once.
+
+# Maps view name (the endpoint without its blueprint prefix) -> maximum number of SQL statements per request
+ROUTE_QUERY_BUDGETS = {}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(max_queries):
+    # Decorator for view functions; put it below @app.route
+    def decorator(view):
+        ROUTE_QUERY_BUDGETS[view.__name__] = max_queries
+        return view
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_app(app):
+    on_engine_created(app, lambda engine: event.listen(engine, 'before_cursor_execute', _count_query))
+
+    @app.after_request
+    def check_query_budget(response):
+        budget = ROUTE_QUERY_BUDGETS.get((request.endpoint or '').rpartition('.')[2])
+        count = g.get('query_count', 0)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint} ran {count} SQL statements (budget {budget})"
+            if app.config.get('QUERY_BUDGET_ENFORCED', app.testing):
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
+
+
+@contextmanager
+def count_queries(engine):
+    # Counts statements run on the engine inside the block, e.g. from a test:
+    #     with count_queries(engine) as counter:
+    #         client.get('/manage_orders')
+    #     assert counter['count'] <= 1
+    counter = {'count': 0}
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _count)
@@ -0,0 +1,128 @@
+import re
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import Category, Product
+
+# Full-text product search backed by an SQLite FTS5 table.
+#
+# products_fts holds one row per product (rowid = product_id) with the product
+# name, description and category name. Triggers on products and categories keep
+# it in sync with every write, including the admin create/edit/delete routes, so
+# no route has to remember to update it.
+
+# bm25() weights for product_name, description, category_name
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_name, description, category_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, product_name, description, category_name)
+        VALUES (new.product_id, new.product_name, coalesce(new.description, ''),
+                coalesce((SELECT category_name FROM categories WHERE category_id = new.category_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update
+    AFTER UPDATE OF product_name, description, category_id ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.product_id;
+        INSERT INTO products_fts (rowid, product_name, description, category_name)
+        VALUES (new.product_id, new.product_name, coalesce(new.description, ''),
+                coalesce((SELECT category_name FROM categories WHERE category_id = new.category_id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.product_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_fts_update AFTER UPDATE OF category_name ON categories BEGIN
+        UPDATE products_fts SET category_name = new.category_name
+        WHERE rowid IN (SELECT product_id FROM products WHERE category_id = new.category_id);
+    END
+    """,
+]
+
+REBUILD_SQL = [
+    "DELETE FROM products_fts",
+    """
+    INSERT INTO products_fts (rowid, product_name, description, category_name)
+    SELECT products.product_id, products.product_name, coalesce(products.description, ''),
+           coalesce(categories.category_name, '')
+    FROM products LEFT JOIN categories ON categories.category_id = products.category_id
+    """,
+]
+
+SEARCH_SQL = f"""
+    SELECT products.* FROM products_fts
+    JOIN products ON products.product_id = products_fts.rowid
+    WHERE products_fts MATCH :match
+    ORDER BY bm25(products_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def ensure_search_index(engine):
+    # Creates the FTS table and triggers if needed and fills the table the first
+    # time. Returns False when SQLite was built without FTS5.
+    if engine.dialect.name != 'sqlite':
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+            )).first()
+            for statement in FTS_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                for statement in REBUILD_SQL:
+                    conn.execute(text(statement))
+    except OperationalError:
+        return False
+    return True
+
+
+def rebuild_search_index(engine):
+    with engine.begin() as conn:
+        for statement in REBUILD_SQL:
+            conn.execute(text(statement))
+
+
+def build_match_query(query):
+    # Every word must match, and each word is also matched as a prefix, so
+    # "ban org" finds "Banana ... A Organics". Words are quoted so user input can
+    # never be read as FTS5 query syntax.
+    words = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_products(db_session, query, limit, offset=0, use_fts=True):
+    if not use_fts:
+        # Fallback for SQLite builds without FTS5: unranked substring search
+        return db_session.execute(
+            select(Product).filter(
+                or_(
+                    Product.product_name.ilike(f'%{query}%'),
+                    Product.description.ilike(f'%{query}%'),
+                    Product.category.has(Category.category_name.ilike(f'%{query}%'))
+                )
+            ).order_by(Product.product_id).limit(limit).offset(offset)
+        ).scalars().all()
+
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    stmt = select(Product).from_statement(
+        text(SEARCH_SQL).bindparams(match=match, limit=limit, offset=offset)
+    )
+    return db_session.execute(stmt).scalars().all()
@@ -0,0 +1,75 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson not installed: fall back to the standard library
+    orjson = None
+
+# Plain dict representations of catalog rows, used by the JSON API and by the
+# catalog cache (cached values must not hold on to ORM objects or sessions)
+
+
+def product_to_dict(product):
+    return {
+        'product_id': product.product_id,
+        'product_name': product.product_name,
+        'product_price': product.product_price,
+        'description': product.description,
+        'category_id': product.category_id,
+        'image_path': product.image_path,
+        'image_variants': product.image_variants
+    }
+
+
+def category_to_dict(category):
+    return {
+        'category_id': category.category_id,
+        'category_name': category.category_name
+    }
+
+
+def dumps(value):
+    # Compact JSON as bytes, using orjson when it is available
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def json_array_chunks(batches):
+    # Streams lists of dicts as one JSON array, one chunk per list
+    yield b'['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        chunk = b','.join(dumps(item) for item in batch)
+        yield chunk if first else b',' + chunk
+        first = False
+    yield b']'
+
+
+def ndjson_chunks(batches):
+    # Streams lists of dicts as newline-delimited JSON, one chunk per list
+    for batch in batches:
+        if batch:
+            yield b''.join(dumps(item) + b'\n' for item in batch)
+
+
+# The same two formats for the async API (asgi_api.py), from an async iterator of lists
+
+async def async_json_array_chunks(batches):
+    yield b'['
+    first = True
+    async for batch in batches:
+        if not batch:
+            continue
+        chunk = b','.join(dumps(item) for item in batch)
+        yield chunk if first else b',' + chunk
+        first = False
+    yield b']'
+
+
+async def async_ndjson_chunks(batches):
+    async for batch in batches:
+        if batch:
+            yield b''.join(dumps(item) + b'\n' for item in batch)
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from db import FULL_SCAN, explain_query_plan, on_engine_created
+
+# Slow-query log.
+#
+# Statements slower than SLOW_QUERY_THRESHOLD_MS are written as one JSON object
+# per line to SLOW_QUERY_LOG (rotated by size), with the route that ran them,
+# their redacted parameters, the duration and SQLite's EXPLAIN QUERY PLAN:
+#     {"time": "...", "reason": "slow", "duration_ms": 182.4, "endpoint": "search",
+#      "path": "/search", "statement": "SELECT ...", "parameters": ["<str len=4>", 24, 0],
+#      "plan": ["SCAN products", ...], "full_scan": true}
+#
+# With SLOW_QUERY_LOG_FULL_SCANS on, a SELECT whose plan reads a whole table is
+# also logged the first time it runs ("reason": "full_scan"), however fast it
+# was, so unindexed lookups show up before the data grows large enough to hurt.
+
+logger = logging.getLogger('slow_queries')
+
+# Distinct statements whose plan was already checked for full scans
+_seen_statements = {}
+_seen_lock = threading.Lock()
+MAX_SEEN_STATEMENTS = 2048
+
+
+def redact(value):
+    # Numbers and NULLs are kept (ids, limits), text and blobs are replaced by their type and length
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__} len={len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def redact_parameters(parameters, executemany):
+    if executemany:
+        return f'<{len(parameters)} parameter sets>'
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    return [redact(value) for value in parameters or ()]
+
+
+def _is_select(statement):
+    return statement.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def _first_full_scan(statement):
+    # True the first time a statement is seen, so its plan is only checked once
+    with _seen_lock:
+        if statement in _seen_statements:
+            return False
+        if len(_seen_statements) >= MAX_SEEN_STATEMENTS:
+            _seen_statements.clear()
+        _seen_statements[statement] = True
+        return True
+
+
+# Start time on the execution context, like instrumentation.py: a statement that
+# raises never reaches after_cursor_execute
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._slow_query_start = time.perf_counter()
+
+
+def init_app(app):
+    threshold_ms = app.config.get('SLOW_QUERY_THRESHOLD_MS')
+    if threshold_ms is None:
+        return
+
+    log_path = app.config.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path,
+            maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=app.config.get('SLOW_QUERY_LOG_BACKUP_COUNT', 5)
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    check_full_scans = app.config.get('SLOW_QUERY_LOG_FULL_SCANS', True)
+
+    def listen(engine):
+        explain = engine.dialect.name == 'sqlite'
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def log_slow_query(conn, cursor, statement, parameters, context, executemany):
+            start = getattr(context, '_slow_query_start', None)
+            if start is None:
+                return
+            duration_ms = (time.perf_counter() - start) * 1000
+            slow = duration_ms >= threshold_ms
+            # EXPLAIN only works for a single statement with one set of parameters
+            can_explain = explain and not executemany and _is_select(statement)
+            if not slow and not (check_full_scans and can_explain and _first_full_scan(statement)):
+                return
+
+            plan = []
+            if can_explain:
+                try:
+                    plan = explain_query_plan(cursor.connection, statement, parameters)
+                except Exception as e:
+                    plan = [f'EXPLAIN failed: {e}']
+            full_scan = any(FULL_SCAN.match(line) for line in plan)
+            if not slow and not full_scan:
+                return
+
+            logger.info(json.dumps({
+                'time': datetime.now(timezone.utc).isoformat(),
+                'reason': 'slow' if slow else 'full_scan',
+                'duration_ms': round(duration_ms, 3),
+                'endpoint': request.endpoint if has_request_context() else None,
+                'path': request.path if has_request_context() else None,
+                'statement': statement,
+                'parameters': redact_parameters(parameters, executemany),
+                'plan': plan,
+                'full_scan': full_scan,
+            }))
+
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+
+    on_engine_created(app, listen)
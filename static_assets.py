@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+from werkzeug.utils import safe_join
+
+from images import HASHED_NAME
+
+try:
+    import brotli
+except ImportError:  # Brotli not installed: only gzip copies are written
+    brotli = None
+
+# Fingerprinted, precompressed static files and compression of dynamic responses.
+#
+# build_static_assets() copies every file under static/ to
+# static/dist/<name>.<content hash>.<ext>, writes .gz and .br copies of the
+# text files next to it and records the names in static/dist/manifest.json:
+#     {"customer.css": "dist/customer.1a2b3c4d5e6f.css", ...}
+# With the manifest loaded, url_for('static', filename='customer.css') returns
+# the fingerprinted URL. Those files are served with Cache-Control: immutable
+# (precompressed when the browser accepts it), since a changed file gets a new
+# URL. Uploads that already have content-hashed names (images.py) are skipped.
+# Old fingerprinted files are kept so pages cached elsewhere can still load them.
+#
+# HTML, JSON and other text responses built by the views are gzipped on the fly
+# when they are at least COMPRESS_MIN_SIZE bytes; streamed responses are sent as is.
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+ONE_YEAR = 31536000
+PRECOMPRESS_MIN_SIZE = 256
+PRECOMPRESS_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.txt', '.json', '.xml', '.html'}
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv', 'application/json',
+                      'application/javascript', 'application/x-ndjson', 'image/svg+xml'}
+# Best encoding first
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _write_file(path, content):
+    # Written under a temporary name and renamed, so workers starting at the
+    # same time never serve half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def fingerprinted_name(relative_path, content):
+    # 'css/site.css' -> 'css/site.1a2b3c4d5e6f.css'
+    stem, extension = os.path.splitext(relative_path)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def build_static_assets(static_folder):
+    # Writes the fingerprinted and compressed copies that don't exist yet and the
+    # manifest, and returns the manifest
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.samefile(root, static_folder):
+            dirs[:] = [name for name in dirs if name != DIST_DIR]
+        for filename in files:
+            relative_path = os.path.relpath(os.path.join(root, filename), static_folder).replace(os.sep, '/')
+            if HASHED_NAME.match(relative_path) or filename.endswith(('.upload', '.tmp')):
+                continue
+            with open(os.path.join(root, filename), 'rb') as f:
+                content = f.read()
+
+            target_name = fingerprinted_name(relative_path, content)
+            target = os.path.join(dist_folder, target_name)
+            if not os.path.exists(target):
+                if os.path.splitext(filename)[1].lower() in PRECOMPRESS_EXTENSIONS and len(content) >= PRECOMPRESS_MIN_SIZE:
+                    _write_file(target + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+                    if brotli is not None:
+                        _write_file(target + '.br', brotli.compress(content, quality=11))
+                # Written last: its existence means the compressed copies are there too
+                _write_file(target, content)
+            manifest[relative_path] = f'{DIST_DIR}/{target_name}'
+
+    _write_file(os.path.join(dist_folder, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    if app.config.get('STATIC_BUILD_ON_STARTUP', True):
+        manifest = build_static_assets(app.static_folder)
+    else:
+        manifest = load_manifest(app.static_folder)
+
+    @app.url_defaults
+    def fingerprinted_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    send_static_file = app.view_functions['static']
+
+    def static(filename):
+        if not filename.startswith(DIST_DIR + '/'):
+            return send_static_file(filename=filename)
+
+        response = None
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            path = safe_join(app.static_folder, filename + suffix)
+            if request.accept_encodings[encoding] and path and os.path.isfile(path):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(app.static_folder, filename)
+
+        # The URL changes whenever the content does, so the file never needs revalidating
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ONE_YEAR
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = static
+
+    @app.after_request
+    def compress_response(response):
+        if (not app.config.get('COMPRESS_RESPONSES', True) or response.direct_passthrough
+                or response.is_streamed or response.mimetype not in COMPRESS_MIMETYPES
+                or response.status_code != 200 or 'Content-Encoding' in response.headers
+                or request.method == 'HEAD'):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if not request.accept_encodings['gzip'] or len(data) < app.config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+
+        response.set_data(gzip.compress(data, compresslevel=app.config.get('COMPRESS_LEVEL', 6)))
+        response.headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The gzipped bytes differ from the plain ones, so only a weak match holds
+            response.set_etag(etag, weak=True)
+        return response
+
+    return manifest
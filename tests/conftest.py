@@ -0,0 +1,74 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'database'))
+
+from main import create_app  # noqa: E402
+from models import Base, Order, OrderLine  # noqa: E402
+from seed_data import seed  # noqa: E402
+
+# Orders of the customer the order-history tests log in as: more than one
+# selectinload batch (500 parents), so a route that loaded them all at once
+# would run an extra query
+HEAVY_BUYER_ORDERS = 600
+
+
+@pytest.fixture(scope='session')
+def database_url(tmp_path_factory):
+    # A small synthetic store, built once for the whole test run
+    url = 'sqlite:///' + str(tmp_path_factory.mktemp('db') / 'store.db')
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    seed(engine, customers=20, categories=5, products=200, orders=300, cart_share=0.5, days=90,
+         rng=random.Random(1))
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        first_order = connection.execute(select(func.max(Order.order_id))).scalar() + 1
+        order_ids = range(first_order, first_order + HEAVY_BUYER_ORDERS)
+        connection.execute(insert(Order), [
+            {'order_id': order_id, 'customer_id': 1, 'address': '1 Main Road', 'phone_number': '9000000000',
+             'created_at': now - timedelta(hours=i)}
+            for i, order_id in enumerate(order_ids)
+        ])
+        connection.execute(insert(OrderLine), [
+            {'order_id': order_id, 'product_id': product_id, 'quantity': 1, 'unit_price': 10.0}
+            for order_id in order_ids for product_id in (1, 2)
+        ])
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def app(database_url, monkeypatch):
+    # Relative paths in the config (uploads, static files) are relative to the project
+    monkeypatch.chdir(PROJECT_ROOT)
+    app = create_app('testing')
+    app.config['DATABASE_URL'] = database_url
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as session:
+        session['admin_id'] = 1
+    return client
+
+
+@pytest.fixture
+def customer_client(client):
+    with client.session_transaction() as session:
+        session['customer_id'] = 1
+    return client
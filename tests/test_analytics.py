@@ -0,0 +1,20 @@
+from datetime import datetime, timedelta
+
+import analytics
+
+
+def test_windows_end_on_the_utc_date(monkeypatch):
+    # Just after midnight UTC in a time zone still on the previous day
+    class FakeDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2024, 3, 10, 0, 30)
+
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2024, 3, 9, 19, 30)
+
+    monkeypatch.setattr(analytics, 'datetime', FakeDatetime)
+    assert analytics._since(1) == datetime(2024, 3, 10).date()
+    assert analytics._since(7) == datetime(2024, 3, 10).date() - timedelta(days=6)
+    assert analytics._since(0) is None
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+import asgi_api
+from models import Base
+
+
+def call(path, query_string=b''):
+    # Runs one GET through the ASGI app: (messages sent, status, body)
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string, 'headers': []}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_api.app(scope, receive, send))
+    return messages, messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+
+@pytest.fixture
+def empty_catalog(tmp_path, monkeypatch):
+    url = 'sqlite:///' + str(tmp_path / 'empty.db')
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    api_engine = asgi_api.create_api_engine(url, 1, 0, 1000)
+    monkeypatch.setattr(asgi_api, 'AsyncDBSession',
+                        sessionmaker(api_engine, class_=AsyncSession, expire_on_commit=False))
+    monkeypatch.setattr(asgi_api, 'version_store', None)
+    yield
+    asyncio.run(api_engine.dispose())
+
+
+@pytest.mark.parametrize('query_string, content_type, body', [
+    (b'stream=1', b'application/json', b'[]'),
+    (b'format=ndjson', b'application/x-ndjson', b''),
+])
+def test_streamed_export_of_an_empty_catalog(empty_catalog, query_string, content_type, body):
+    messages, status, sent = call('/api/products', query_string)
+    assert messages[0]['type'] == 'http.response.start'
+    assert status == 200
+    assert dict(messages[0]['headers'])[b'content-type'] == content_type
+    assert sent == body
+    assert messages[-1] == {'type': 'http.response.body', 'body': b''}
@@ -0,0 +1,28 @@
+import os
+
+from catalog_cache import FileCatalogVersion
+
+
+def test_other_workers_see_bumps_within_one_mtime_tick(tmp_path):
+    path = str(tmp_path / 'catalog_version')
+    writer, reader = FileCatalogVersion(path), FileCatalogVersion(path, recheck_seconds=3600)
+    mtime_ns = os.stat(path).st_mtime_ns
+    assert reader.get()[0] == 1
+
+    # Two bumps on a filesystem with a coarse timestamp: the mtime doesn't move
+    for version in (2, 3):
+        writer.bump()
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        assert reader.get()[0] == version
+
+
+def test_version_is_rechecked_after_recheck_seconds(tmp_path):
+    path = str(tmp_path / 'catalog_version')
+    reader = FileCatalogVersion(path, recheck_seconds=0)
+    assert reader.get()[0] == 1
+    # Same inode, mtime and size, as after an inode is reused
+    st = os.stat(path)
+    with open(path, 'w') as f:
+        f.write(f'2 {reader.get()[1]}')
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert reader.get()[0] == 2
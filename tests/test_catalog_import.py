@@ -0,0 +1,59 @@
+import io
+
+from catalog_import import export_catalog, import_catalog
+from db import DBSession
+from models import Cart, CartItem, Category, Product
+
+
+def test_import_creates_non_ascii_categories(app):
+    catalog = io.BytesIO(
+        "sku,name,price,category,description\n"
+        "T17-1,Cumin,40,Épices,\n"
+        "T17-2,Clove,55,ÉPICES,\n"
+        "T17-3,Saffron,300,Épices ,Kashmir\n".encode('utf-8')
+    )
+    with app.app_context():
+        db_session = DBSession()
+        report = import_catalog(db_session, catalog, 'csv')
+
+        assert (report.inserted, report.categories_created, report.error_count) == (3, 1, 0)
+        category = db_session.query(Category).filter_by(category_name='Épices').one()
+        products = db_session.query(Product).filter(Product.sku.in_(['T17-1', 'T17-2', 'T17-3'])).all()
+        assert {product.category_id for product in products} == {category.category_id}
+
+
+def test_import_sets_stock_and_keeps_it_when_left_out(app):
+    with app.app_context():
+        db_session = DBSession()
+        report = import_catalog(db_session, io.BytesIO(
+            b"sku,name,price,category,description,stock\n"
+            b"T19-1,Rice,60,Grains,,25\n"
+            b"T19-2,Wheat,45,Grains,,\n"
+        ), 'csv')
+        assert (report.inserted, report.added_without_stock) == (2, 1)
+        assert "1 products added without stock" in report.summary()
+
+        # A file without the stock column updates everything but the stock
+        import_catalog(db_session, io.BytesIO(b"sku,name,price,category\nT19-1,Basmati Rice,70,Grains\n"), 'csv')
+        rice = db_session.query(Product).filter_by(sku='T19-1').one()
+        assert (rice.product_name, rice.stock_quantity) == ('Basmati Rice', 25)
+        rice_id = rice.product_id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['customer_id'] = 2
+    client.get(f'/add_to_cart/{rice_id}')
+    with app.app_context():
+        assert DBSession().query(CartItem).join(Cart).filter(
+            Cart.customer_id == 2, CartItem.product_id == rice_id
+        ).count() == 1
+
+
+def test_export_round_trips_stock(app):
+    with app.app_context():
+        db_session = DBSession()
+        import_catalog(db_session, io.BytesIO(b'{"sku": "T19-3", "name": "Oats", "price": 90, "category": "Grains", "stock": 7}\n'),
+                       'ndjson')
+        exported = ''.join(export_catalog(db_session, 'csv'))
+    assert exported.splitlines()[0] == 'sku,name,price,category,description,stock'
+    assert 'T19-3,Oats,90.0,Grains,,7' in exported.splitlines()
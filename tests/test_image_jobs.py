@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from PIL import Image
+
+import main
+from db import DBSession
+from models import Product
+
+
+@pytest.fixture
+def upload_folder(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    with app.app_context():
+        yield tmp_path
+
+
+@pytest.fixture
+def product_image(upload_folder):
+    # Product 1 shows a freshly uploaded image until the test ends
+    Image.new('RGB', (400, 300), 'green').save(upload_folder / 'aaaaaaaaaaaaaaaa.png')
+    set_image(1, 'aaaaaaaaaaaaaaaa.png')
+    yield 'aaaaaaaaaaaaaaaa.png'
+    set_image(1, None)
+
+
+def set_image(product_id, image_path):
+    db_session = DBSession()
+    db_session.query(Product).filter_by(product_id=product_id).update(
+        {'image_path': image_path, 'image_variants': None}, synchronize_session=False
+    )
+    db_session.commit()
+    DBSession.remove()
+
+
+def test_variants_job_builds_and_records_variants(product_image, upload_folder):
+    main.build_image_variants(1, product_image)
+    variants = DBSession().get(Product, 1).image_variants
+    assert variants['webp']['320'] == 'aaaaaaaaaaaaaaaa-320.webp'
+    assert os.path.exists(upload_folder / 'aaaaaaaaaaaaaaaa-320.webp')
+
+
+def test_variants_job_skips_a_replaced_or_missing_image(product_image, upload_folder):
+    main.build_image_variants(1, 'bbbbbbbbbbbbbbbb.png')  # No longer the product's image
+    os.remove(upload_folder / product_image)
+    main.build_image_variants(1, product_image)  # File already deleted
+    assert os.listdir(upload_folder) == []
+
+
+def test_variants_written_after_the_image_was_dropped_are_deleted(product_image, upload_folder, monkeypatch):
+    generate_variants = main.generate_variants
+
+    def generate_while_the_product_changes(folder, filename):
+        set_image(1, None)
+        main.delete_product_image(filename)  # Runs before the variants exist
+        Image.new('RGB', (400, 300), 'green').save(upload_folder / filename)
+        return generate_variants(folder, filename)
+
+    monkeypatch.setattr(main, 'generate_variants', generate_while_the_product_changes)
+    main.build_image_variants(1, product_image)
+    assert os.listdir(upload_folder) == []
+
+
+def test_delete_job_finds_variants_by_file_name(upload_folder):
+    names = ['cccccccccccccccc.png', 'cccccccccccccccc-160.webp', 'cccccccccccccccc-160.jpg',
+             'cccccccccccccccc-97.jpg', 'dddddddddddddddd-160.jpg']
+    for name in names:
+        (upload_folder / name).write_bytes(b'')
+    main.delete_product_image('cccccccccccccccc.png', variants=None)
+    assert os.listdir(upload_folder) == ['dddddddddddddddd-160.jpg']
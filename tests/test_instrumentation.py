@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from flask import g
+from sqlalchemy import event, exc, text
+
+from db import get_engine
+from main import create_app
+
+
+@pytest.fixture
+def engine(tmp_path):
+    app = create_app('testing')
+    app.config['DATABASE_URL'] = 'sqlite:///' + str(tmp_path / 'timing.db')
+    engine = get_engine(app)
+
+    @event.listens_for(engine, 'connect')
+    def add_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function('sleep_ms', 1, lambda ms: time.sleep(ms / 1000))
+
+    engine.dispose()  # Connections opened while the app set the engine up lack sleep_ms
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+        conn.execute(text('INSERT INTO items (id) VALUES (1)'))
+    with app.test_request_context():
+        yield engine
+    engine.dispose()
+
+
+def test_failed_statement_does_not_skew_later_timings(engine):
+    with engine.connect() as conn:
+        with pytest.raises(exc.IntegrityError):
+            conn.execute(text('INSERT INTO items (id) VALUES (1)'))
+        time.sleep(0.2)
+        g.sql_time = 0.0
+        conn.execute(text('SELECT sleep_ms(50)'))
+        assert 0.05 <= g.sql_time < 0.2
+        assert not any('start' in key for key in conn.info)
@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import HEAVY_BUYER_ORDERS
+from query_budgets import ROUTE_QUERY_BUDGETS, QueryBudgetExceeded
+
+# Every route with a @query_budget, called against the seeded store. The testing
+# profile enforces the budgets, so a route that runs more SQL statements than
+# its budget raises QueryBudgetExceeded out of the request.
+#     (view name, who is logged in, method, path, form data)
+BUDGETED_REQUESTS = [
+    ('index', None, 'GET', '/', None),
+    ('index', None, 'GET', '/?after=100&per_page=50', None),
+    ('view_categories', None, 'GET', '/view_categories', None),
+    ('view_products_by_category', None, 'GET', '/view_products/1', None),
+    ('view_cart', 'customer', 'GET', '/cart', None),
+    ('view_cart', None, 'GET', '/cart', None),
+    ('add_to_cart', 'customer', 'GET', '/add_to_cart/3', None),
+    ('add_to_cart', None, 'GET', '/add_to_cart/3', None),
+    ('order_product', 'customer', 'GET', '/order_product/4', None),
+    ('update_guest_cart', None, 'POST', '/update_guest_cart/3', {'quantity': '2'}),
+    ('manage_orders', 'admin', 'GET', '/manage_orders', None),
+    ('manage_orders', 'admin', 'GET', '/manage_orders?per_page=200', None),
+    ('admin_analytics', 'admin', 'GET', '/admin/analytics?days=0', None),
+    ('checkout', 'customer', 'GET', '/checkout', None),
+    ('customer_orders', 'customer', 'GET', '/customer/orders', None),
+    ('customer_orders', 'customer', 'GET', '/customer/orders?per_page=200', None),
+    ('search', None, 'GET', '/search?query=fresh', None),
+    ('search', None, 'GET', '/search?query=fresh&page=2', None),
+    ('get_products_api', None, 'GET', '/api/products?per_page=100', None),
+    ('get_categories_api', None, 'GET', '/api/categories', None),
+]
+
+
+def log_in(client, who):
+    with client.session_transaction() as session:
+        if who == 'admin':
+            session['admin_id'] = 1
+        elif who == 'customer':
+            session['customer_id'] = 1
+
+
+@pytest.mark.parametrize('view, who, method, path, data', BUDGETED_REQUESTS,
+                         ids=[f'{request[0]}:{request[3]}' for request in BUDGETED_REQUESTS])
+def test_route_stays_within_its_query_budget(client, view, who, method, path, data):
+    log_in(client, who)
+    response = client.open(path, method=method, data=data)
+    assert response.status_code < 400
+
+
+def test_every_budgeted_route_is_exercised():
+    assert {request[0] for request in BUDGETED_REQUESTS} == set(ROUTE_QUERY_BUDGETS)
+
+
+def test_checkout_stays_within_its_query_budget(customer_client):
+    for product_id in (5, 6, 7, 8, 9, 10, 11):
+        customer_client.get(f'/add_to_cart/{product_id}')
+    response = customer_client.post('/checkout', data={'address': '1 Main Road', 'phone': '9000000000'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/')
+
+
+def test_order_history_is_paginated(customer_client):
+    # More orders than fit on a page, or in one selectinload batch
+    first = customer_client.get('/customer/orders?per_page=200')
+    assert first.get_data(as_text=True).count('1 Main Road') == 200
+    assert 'Older Orders' in first.get_data(as_text=True)
+
+    seen = 0
+    path = '/customer/orders?per_page=200'
+    while path:
+        page = customer_client.get(path).get_data(as_text=True)
+        seen += page.count('1 Main Road')
+        cursor = page.split('after=')[1].split('&')[0] if 'Older Orders' in page else None
+        path = f'/customer/orders?after={cursor}&per_page=200' if cursor else None
+    assert seen >= HEAVY_BUYER_ORDERS
+
+
+def test_going_over_budget_raises(client, monkeypatch):
+    monkeypatch.setitem(ROUTE_QUERY_BUDGETS, 'view_categories', -1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/view_categories')
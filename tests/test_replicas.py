@@ -0,0 +1,35 @@
+import sqlite3
+
+import pytest
+
+from main import create_app
+
+
+@pytest.fixture
+def replica_url(client, database_url, tmp_path):
+    # A copy of the store taken before the primary had its search index
+    client.get('/view_categories')  # Creates the index on the primary
+    replica_path = tmp_path / 'replica.db'
+    primary = sqlite3.connect(database_url[len('sqlite:///'):])
+    replica = sqlite3.connect(replica_path)
+    primary.backup(replica)
+    primary.close()
+    for name in ('products_fts_insert', 'products_fts_update', 'products_fts_delete', 'categories_fts_update'):
+        replica.execute(f'DROP TRIGGER IF EXISTS {name}')
+    replica.execute('DROP TABLE products_fts')
+    replica.commit()
+    replica.close()
+    return f'sqlite:///{replica_path}'
+
+
+def test_search_falls_back_to_the_primary_without_a_replica_index(database_url, replica_url):
+    app = create_app('testing')
+    app.config['DATABASE_URL'] = database_url
+    app.config['DATABASE_REPLICA_URLS'] = [replica_url]
+    app.config['REPLICA_LAG_SECONDS'] = 0  # Read from the replica straight away
+    # The failed replica query and the retry both count against the budget
+    app.config['QUERY_BUDGET_ENFORCED'] = False
+
+    response = app.test_client().get('/search?query=fresh')
+    assert response.status_code == 200
+    assert 'No products found' not in response.get_data(as_text=True)
@@ -0,0 +1,60 @@
+import json
+import logging
+import time
+
+import pytest
+from sqlalchemy import event, exc, text
+
+import slow_queries
+from db import get_engine
+from main import create_app
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+
+    def emit(self, record):
+        self.entries.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def slow_log(tmp_path):
+    # The slow-query log of an app with a 100 ms threshold, on a database with sleep_ms()
+    handler = ListHandler()
+    slow_queries.logger.addHandler(handler)  # Instead of the log file
+    level = slow_queries.logger.level
+    slow_queries.logger.setLevel(logging.INFO)
+    app = create_app('testing')
+    app.config.update(DATABASE_URL='sqlite:///' + str(tmp_path / 'slow.db'),
+                      SLOW_QUERY_THRESHOLD_MS=100, SLOW_QUERY_LOG_FULL_SCANS=False)
+    slow_queries.init_app(app)
+    engine = get_engine(app)
+
+    @event.listens_for(engine, 'connect')
+    def add_sleep(dbapi_connection, connection_record):
+        dbapi_connection.create_function('sleep_ms', 1, lambda ms: time.sleep(ms / 1000))
+
+    engine.dispose()  # Connections opened while the app set the engine up lack sleep_ms
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE items (id INTEGER PRIMARY KEY)'))
+        conn.execute(text('INSERT INTO items (id) VALUES (1)'))
+    yield engine, handler.entries
+    engine.dispose()
+    slow_queries.logger.removeHandler(handler)
+    slow_queries.logger.setLevel(level)
+
+
+def test_slow_statement_after_a_failed_one_is_timed_correctly(slow_log):
+    engine, entries = slow_log
+    with engine.connect() as conn:
+        with pytest.raises(exc.IntegrityError):
+            conn.execute(text('INSERT INTO items (id) VALUES (1)'))
+        time.sleep(0.2)
+        conn.execute(text('SELECT id FROM items'))
+        conn.execute(text('SELECT sleep_ms(150)'))
+        assert not any('start' in key for key in conn.info)
+
+    assert [entry['statement'] for entry in entries] == ['SELECT sleep_ms(150)']
+    assert 150 <= entries[0]['duration_ms'] < 300
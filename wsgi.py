@@ -0,0 +1,5 @@
+from main import create_app
+
+# Entry point for WSGI servers: gunicorn -w 4 wsgi:app
+# The profile comes from APP_CONFIG (e.g. APP_CONFIG=production)
+app = create_app()